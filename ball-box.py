@@ -7,6 +7,41 @@ import vpython
 
 GRAVITY = -9.81
 
+# Plotting three energies every step costs more than the physics does. In
+# record mode, the loop only saves the ball's state, and the energies get
+# worked out and plotted once the run is over.
+RECORD = False
+
+# Between bounces, the ball follows an exact parabola. In event-driven mode,
+# the bounces are all worked out up front, straight from one to the next, and
+# each frame just looks up where the ball is. No step is ever big enough to
+# let it sink into a wall.
+EVENT_DRIVEN = False
+
+# Gas mode fills the box with GAS_BALLS small balls that bounce off the walls
+# and off each other, using the arrays in gas.py. Only nearby balls get
+# checked against each other, so thousands of balls are fine. The spheres
+# are moved once every STEPS_PER_FRAME steps.
+GAS = False
+GAS_BALLS = 1000
+GAS_RADIUS = 0.1
+STEPS_PER_FRAME = 10
+
+# Obstacle mode drops the gas through a funnel onto rows of pegs, like a
+# Galton board. The walls, pegs, and ramps are ordinary vpython boxes and
+# cylinders. They never move, so a tree over them is built once, up front,
+# and each step a ball only gets checked against the obstacles near it.
+OBSTACLES = False
+OBSTACLE_BALLS = 150
+PEG_RADIUS = 0.08
+
+# One run is one random start. Running ensemble.py does thousands of them on
+# every core and saves the number of bounces, the time until the first
+# bounce, and the energy drift of each one to ENSEMBLE_FILE. Ensemble mode
+# skips the animation and plots what's in that file instead.
+ENSEMBLE = False
+ENSEMBLE_FILE = "ball-box-ensemble.npz"
+
 
 def main():
     box_size = 10
@@ -36,6 +71,16 @@ def main():
             color=vpython.color.blue,
         )
 
+    if ENSEMBLE:
+        plot_ensemble()
+        return
+    if OBSTACLES:
+        run_obstacles(box_sides, box_thickness, box_size)
+        return
+    if GAS:
+        run_gas(box_sides, box_thickness, box_size)
+        return
+
     # Initial position chosen randomly inside the box
     x0 = vpython.vector(
         random.random()*box_size - 0.5*box_size,
@@ -68,32 +113,256 @@ def main():
     graph_pot = vpython.gcurve(color=vpython.color.blue, width=2, label="Potential Energy")
     graph_kin = vpython.gcurve(color=vpython.color.red, width=2, label="Kinetic Energy")
     graph_tot = vpython.gcurve(color=vpython.color.magenta, width=2, label="Total Energy")
+    if RECORD:
+        # Imported here so the default runs without numpy.
+        import diagnostics
+        recording = diagnostics.new_recording("t", "y", "v")
     # Time loop! Handle gravity and collisions
     t, dt, tmax = 0, 0.001, 10
+    if EVENT_DRIVEN:
+        # Imported here so the default runs without numpy.
+        import bounces
+        # The last frame can land a hair past tmax.
+        events = bounce_events(ball, box_sides, box_thickness, tmax + dt)
     while t < tmax:
         t += dt
         vpython.rate(1/dt)
-        dvdt = -GRAVITY*vpython.vector(0, -1, 0)
-        ball.v += dvdt*dt
-        ball.pos += ball.v*dt
-        # Check for collisions
-        for side in box_sides:
-            # Vector from the center of the ball to the center of the wall
-            center_to_center = ball.pos - side.pos
-            # Project onto the wall's perpendicular unit vector to get distance
-            distance = center_to_center.dot(side.axis)
-            # If it's a collision, flip the component of the ball's velocity
-            # that's perpendicular to the wall
-            if distance < (ball.radius + 0.5*box_thickness):
-                dv = -2*side.axis.dot(ball.v)
-                ball.v += side.axis*dv
+        if EVENT_DRIVEN:
+            pos, v = bounces.state_at(events, t)
+            ball.pos = vpython.vector(*pos)
+            ball.v = vpython.vector(*v)
+        else:
+            dvdt = -GRAVITY*vpython.vector(0, -1, 0)
+            ball.v += dvdt*dt
+            ball.pos += ball.v*dt
+            # Check for collisions
+            for side in box_sides:
+                # Vector from the center of the ball to the center of the wall
+                center_to_center = ball.pos - side.pos
+                # Project onto the wall's perpendicular unit vector to get
+                # distance
+                distance = center_to_center.dot(side.axis)
+                # If it's a collision, flip the component of the ball's
+                # velocity that's perpendicular to the wall
+                if distance < (ball.radius + 0.5*box_thickness):
+                    dv = -2*side.axis.dot(ball.v)
+                    ball.v += side.axis*dv
+        if RECORD:
+            diagnostics.record(
+                recording, t=t, y=ball.pos.y, v=(ball.v.x, ball.v.y, ball.v.z)
+            )
+            continue
         energy_pot = -ball.m*GRAVITY*ball.pos.y
         energy_kin = 0.5*ball.m*ball.v.dot(ball.v)
         graph_pot.plot(t, energy_pot)
         graph_kin.plot(t, energy_kin)
         graph_tot.plot(t, energy_pot + energy_kin)
+    if RECORD:
+        # Same energies as above, for every step at once.
+        history = diagnostics.to_arrays(recording)
+        energy_pot = -ball.m*GRAVITY*history["y"]
+        energy_kin = 0.5*ball.m*(history["v"]**2).sum(axis=1)
+        diagnostics.plot(graph_pot, history["t"], energy_pot)
+        diagnostics.plot(graph_kin, history["t"], energy_kin)
+        diagnostics.plot(graph_tot, history["t"], energy_pot + energy_kin)
     return
 
 
+def run_gas(box_sides, box_thickness, box_size):
+    # The walls are all lined up with the axes, so the box for the centers of
+    # the balls is just a range in x and y. There's no lid.
+    import numpy as np
+    import gas
+    lo = np.array([-np.inf, -np.inf])
+    hi = np.array([np.inf, np.inf])
+    for side in box_sides:
+        axis = np.array([side.axis.x, side.axis.y])
+        k = np.argmax(np.abs(axis))
+        edge = side.pos.dot(side.axis) + GAS_RADIUS + 0.5*box_thickness
+        if axis[k] > 0:
+            lo[k] = edge
+        else:
+            hi[k] = -edge
+    # Start anywhere below the top of the walls, slow enough to stay in.
+    top = np.where(np.isfinite(hi), hi, 0.5*box_size - GAS_RADIUS)
+    v_max = math.sqrt(-2*GRAVITY*(top[1] - lo[1]))
+    pos, vel = gas.random_gas(GAS_BALLS, GAS_RADIUS, lo, top, v_max)
+    gravity = np.array([0, GRAVITY])
+    mass = 1
+    balls = [
+        vpython.sphere(
+            pos=vpython.vector(x, y, 0),
+            color=vpython.color.red,
+            radius=GAS_RADIUS,
+        )
+        for x, y in pos
+    ]
+    graph_pot, graph_kin, graph_tot = energy_graph("Gas in a Box")
+    t, dt, tmax = 0, 0.001, 10
+    while t < tmax:
+        t += dt*STEPS_PER_FRAME
+        vpython.rate(1/(dt*STEPS_PER_FRAME))
+        for _ in range(STEPS_PER_FRAME):
+            gas.step(pos, vel, mass, GAS_RADIUS, gravity, lo, hi, dt)
+        for ball, (x, y) in zip(balls, pos):
+            ball.pos = vpython.vector(x, y, 0)
+        energy_pot = -mass*GRAVITY*pos[:, 1].sum()
+        energy_kin = 0.5*mass*(vel**2).sum()
+        graph_pot.plot(t, energy_pot)
+        graph_kin.plot(t, energy_kin)
+        graph_tot.plot(t, energy_pot + energy_kin)
+    return
+
+
+def run_obstacles(box_sides, box_thickness, box_size):
+    # Elastic balls dropped from inside the box can't get back out over the
+    # walls. But they trade energy when they hit each other, so put a lid on.
+    import numpy as np
+    import gas
+    import obstacles
+    lid = vpython.box(
+        pos=vpython.vector(0, 0.5*box_size, 0),
+        axis=vpython.vector(0, -1, 0),
+        height=box_size,
+        width=box_size,
+    )
+    # Two ramps across the middle make a funnel, with a gap between them.
+    ramps = [
+        vpython.box(
+            pos=vpython.vector(side*0.3*box_size, 0, 0),
+            axis=vpython.vector(side, 0.4, 0),
+            up=vpython.vector(0, 1, 0),
+            size=vpython.vector(0.45*box_size, 0.4, 1),
+        )
+        for side in (-1, 1)
+    ]
+    # Rows of pegs underneath, each row shifted by half a gap.
+    spacing = 4*PEG_RADIUS + 4*GAS_RADIUS
+    edge = 0.5*box_size - 0.5*box_thickness
+    pegs = []
+    for row, y in enumerate(np.arange(-0.4, -0.15, 0.05)*box_size):
+        shift = 0.5*spacing*(row % 2)
+        for x in np.arange(-edge, edge, spacing) + shift:
+            if abs(x) < edge - PEG_RADIUS:
+                pegs.append(vpython.cylinder(
+                    pos=vpython.vector(x, y, -0.5),
+                    axis=vpython.vector(0, 0, 1),
+                    radius=PEG_RADIUS,
+                ))
+    tree = obstacles.build_bvh(
+        obstacles.from_vpython(box_sides + [lid] + ramps, pegs)
+    )
+    # The balls start at rest above the funnel. Positions have a z so they
+    # can be checked against the obstacles, but it stays at zero.
+    lo = np.array([-0.42, 0.15])*box_size
+    hi = np.array([0.42, 0.43])*box_size
+    flat, _ = gas.random_gas(OBSTACLE_BALLS, GAS_RADIUS, lo, hi, 0)
+    pos = np.zeros((OBSTACLE_BALLS, 3))
+    pos[:, :2] = flat
+    vel = np.zeros((OBSTACLE_BALLS, 3))
+    gravity = np.array([0, GRAVITY, 0])
+    mass = 1
+    balls = [
+        vpython.sphere(
+            pos=vpython.vector(*p),
+            color=vpython.color.red,
+            radius=GAS_RADIUS,
+        )
+        for p in pos
+    ]
+    graph_pot, graph_kin, graph_tot = energy_graph("Galton Board")
+    t, dt, tmax = 0, 0.001, 10
+    while t < tmax:
+        t += dt*STEPS_PER_FRAME
+        vpython.rate(1/(dt*STEPS_PER_FRAME))
+        for _ in range(STEPS_PER_FRAME):
+            vel += gravity*dt
+            pos += vel*dt
+            obstacles.bounce(tree, pos, vel, GAS_RADIUS)
+            i, j = gas.find_pairs(pos, 2*GAS_RADIUS)
+            gas.collide(pos, vel, mass, i, j)
+        for ball, p in zip(balls, pos):
+            ball.pos = vpython.vector(*p)
+        energy_pot = -mass*GRAVITY*pos[:, 1].sum()
+        energy_kin = 0.5*mass*(vel**2).sum()
+        graph_pot.plot(t, energy_pot)
+        graph_kin.plot(t, energy_kin)
+        graph_tot.plot(t, energy_pot + energy_kin)
+    return
+
+
+def energy_graph(title):
+    # Graph pane with a curve for each kind of energy.
+    vpython.graph(
+        title=title,
+        xtitle="Time (s)",
+        ytitle="Energy (J)",
+        fast=False,
+    )
+    graph_pot = vpython.gcurve(
+        color=vpython.color.blue, width=2, label="Potential Energy"
+    )
+    graph_kin = vpython.gcurve(
+        color=vpython.color.red, width=2, label="Kinetic Energy"
+    )
+    graph_tot = vpython.gcurve(
+        color=vpython.color.magenta, width=2, label="Total Energy"
+    )
+    return graph_pot, graph_kin, graph_tot
+
+
+def plot_ensemble():
+    # The runs themselves happen in ensemble.py, away from vpython. This just
+    # reads them back and draws a histogram of each statistic.
+    import os
+    import numpy as np
+    import ensemble
+    if not os.path.exists(ENSEMBLE_FILE):
+        raise FileNotFoundError(
+            "No %s yet. Run ensemble.py first." % ENSEMBLE_FILE
+        )
+    with np.load(ENSEMBLE_FILE) as saved:
+        results = dict(saved)
+    ensemble.summarize(results)
+    flight = results["flight"][np.isfinite(results["flight"])]
+    for title, xtitle, values in (
+        ("Bounces", "Bounces in 10 s", results["bounces"]),
+        ("Time of Flight", "Time until first bounce (s)", flight),
+        ("Energy Drift", "Energy drift (J/kg)", results["drift"]),
+    ):
+        counts, edges = np.histogram(values, bins=40)
+        vpython.graph(title=title, xtitle=xtitle, ytitle="Runs", fast=False)
+        bars = vpython.gvbars(delta=edges[1] - edges[0],
+                              color=vpython.color.blue)
+        for center, count in zip(0.5*(edges[:-1] + edges[1:]), counts):
+            bars.plot(center, count)
+    return
+
+
+def walls(box_sides, box_thickness, radius):
+    # Each wall is a plane the center of the ball can't cross. It sits the
+    # ball's radius plus half the wall's thickness in from the middle of the
+    # wall, same as the collision check in main().
+    import numpy as np
+    normals = np.array([
+        [side.axis.x, side.axis.y, side.axis.z] for side in box_sides
+    ])
+    offsets = np.array([
+        side.pos.dot(side.axis) + radius + 0.5*box_thickness
+        for side in box_sides
+    ])
+    return normals, offsets
+
+
+def bounce_events(ball, box_sides, box_thickness, tmax):
+    import bounces
+    normals, offsets = walls(box_sides, box_thickness, ball.radius)
+    return bounces.simulate(
+        [ball.pos.x, ball.pos.y, ball.pos.z],
+        [ball.v.x, ball.v.y, ball.v.z],
+        [0, GRAVITY, 0], normals, offsets, tmax,
+    )
+
+
 if __name__ == "__main__":
     main()
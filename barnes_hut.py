@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+"""
+Barnes-Hut octree gravity. Distant groups of bodies are lumped together at
+their center of mass, which brings the cost of a force pass down from O(N^2)
+to O(N log N). The opening angle theta trades accuracy for speed: theta=0
+opens every node and reproduces direct summation, while the usual choice of
+theta=0.5 gives a typical force error around half a percent.
+
+The tree is built and walked with whole-array operations rather than a Python
+object per node. Bodies are sorted along a Morton (Z-order) curve, so every
+node is a contiguous slice of the sorted arrays.
+
+Running this file directly benchmarks the tree against direct summation.
+"""
+
+import time
+
+import numpy as np
+
+import nbody
+from nbody import AU, G, M_SUN
+
+
+# Bits of Morton key per axis. Three axes have to fit in a 64-bit integer.
+MAX_DEPTH = 21
+
+# Bodies are walked through the tree in chunks to cap memory use.
+CHUNK_SIZE = 2**14
+
+
+def main():
+    # Direct summation stops at a few thousand bodies, since it needs N^2
+    # memory as well as N^2 time.
+    print("%8s %12s %12s %12s" % ("n", "direct (s)", "tree (s)", "median err"))
+    for n in (1000, 2000, 4000, 10000, 30000, 100000):
+        pos, vel, mass = nbody.cluster_state(
+            n, radius=1*AU, total_mass=1*M_SUN
+        )
+        start = time.perf_counter()
+        acc_tree = accelerations(pos, mass, softening=0.001*AU)
+        time_tree = time.perf_counter() - start
+        if n > 4000:
+            print("%8d %12s %12.3f %12s" % (n, "-", time_tree, "-"))
+            continue
+        start = time.perf_counter()
+        acc_direct = nbody.accelerations(pos, mass, softening=0.001*AU)
+        time_direct = time.perf_counter() - start
+        error = np.median(
+            np.linalg.norm(acc_tree - acc_direct, axis=1) /
+            np.linalg.norm(acc_direct, axis=1)
+        )
+        print("%8d %12.3f %12.3f %12.2e" % (n, time_direct, time_tree, error))
+    return
+
+
+def build_tree(pos, mass):
+    """Returns a dictionary of node arrays. Node 0 is the root. Children of a
+    node are stored contiguously, starting at first_child. Each node covers
+    the sorted bodies from start to start + count.
+    """
+    # Fit everything in a cube, then give each body an integer cell on each
+    # axis at the finest level.
+    lo = pos.min(axis=0)
+    side = max(np.max(pos.max(axis=0) - lo), np.finfo(float).tiny)
+    # Nudge the cube out a touch so the farthest body stays inside it.
+    side *= 1 + 1e-9
+    cells = ((pos - lo)/side*2**MAX_DEPTH).astype(np.uint64)
+    keys = morton_keys(cells)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    pos_sorted = pos[order]
+    mass_sorted = mass[order]
+    # Each level only needs the bodies that share a node with someone else.
+    # Lone bodies become leaves and drop out.
+    active = np.arange(len(mass))
+    levels = []
+    for level in range(MAX_DEPTH + 1):
+        shift = np.uint64(3*(MAX_DEPTH - level))
+        prefix = keys[active] >> shift
+        first = np.concatenate(([0], np.flatnonzero(np.diff(prefix)) + 1))
+        count = np.diff(np.append(first, len(active)))
+        node_mass = np.add.reduceat(mass_sorted[active], first)
+        weighted = np.add.reduceat(
+            mass_sorted[active, np.newaxis]*pos_sorted[active], first
+        )
+        levels.append({
+            "prefix": prefix[first],
+            "start": active[first],
+            "count": count,
+            "mass": node_mass,
+            "com": weighted/node_mass[:, np.newaxis],
+            "size": np.full(len(first), side/2**level),
+        })
+        active = active[np.repeat(count > 1, count)]
+        if len(active) == 0:
+            break
+    # Stitch the levels into flat arrays, linking each node to its children on
+    # the next level down.
+    offsets = np.cumsum([0] + [len(lev["count"]) for lev in levels])
+    first_child = np.zeros(offsets[-1], dtype=np.int64)
+    n_children = np.zeros(offsets[-1], dtype=np.int64)
+    for level in range(len(levels) - 1):
+        parents = levels[level]["prefix"]
+        children = levels[level + 1]["prefix"] >> np.uint64(3)
+        left = np.searchsorted(children, parents, side="left")
+        right = np.searchsorted(children, parents, side="right")
+        span = slice(offsets[level], offsets[level + 1])
+        first_child[span] = left + offsets[level + 1]
+        n_children[span] = right - left
+    tree = {
+        key: np.concatenate([lev[key] for lev in levels])
+        for key in ("start", "count", "mass", "com", "size")
+    }
+    tree["first_child"] = first_child
+    tree["n_children"] = n_children
+    tree["order"] = order
+    tree["pos"] = pos_sorted
+    tree["body_mass"] = mass_sorted
+    return tree
+
+
+def accelerations(pos, mass, g=G, softening=0, theta=0.5):
+    # Same call signature as nbody.accelerations, so this can be handed to
+    # nbody.advance as its accel function. Use functools.partial to pick a
+    # different theta.
+    tree = build_tree(pos, mass)
+    acc_sorted = np.zeros_like(pos)
+    for chunk_start in range(0, len(mass), CHUNK_SIZE):
+        chunk_stop = min(chunk_start + CHUNK_SIZE, len(mass))
+        bodies = np.arange(chunk_start, chunk_stop)
+        acc_sorted[bodies] = walk_tree(tree, bodies, theta, softening)
+    # Put the results back in the caller's order.
+    acc = np.empty_like(acc_sorted)
+    acc[tree["order"]] = acc_sorted
+    return g*acc
+
+
+def walk_tree(tree, bodies, theta, softening):
+    # Every body starts at the root. Each pass, each (body, node) pair either
+    # gets accepted as a single interaction or gets replaced by the node's
+    # children. The frontier empties out after at most MAX_DEPTH passes.
+    acc = np.zeros((len(bodies), 3))
+    target = np.arange(len(bodies))
+    node = np.zeros(len(bodies), dtype=np.int64)
+    while len(node):
+        body = bodies[target]
+        start = tree["start"][node]
+        inside = (body >= start) & (body < start + tree["count"][node])
+        leaf = tree["n_children"][node] == 0
+        sep = tree["com"][node] - tree["pos"][body]
+        dist2 = np.einsum("ij,ij->i", sep, sep)
+        # A node that holds the body itself always gets opened. Otherwise it's
+        # opened if it looks too big from where the body sits.
+        is_open = ~leaf & (inside | (tree["size"][node]**2 > theta**2*dist2))
+        accept = ~is_open
+        node_mass = tree["mass"][node[accept]]
+        sep = sep[accept]
+        # A leaf at the bottom of the tree may hold the body along with some
+        # close neighbors. Take the body's own mass back out of the lump.
+        own = inside[accept]
+        if np.any(own):
+            body_pos = tree["pos"][body[accept][own]]
+            body_mass = tree["body_mass"][body[accept][own]]
+            rest_mass = node_mass[own] - body_mass
+            rest_com = (
+                tree["com"][node[accept][own]]*node_mass[own, np.newaxis]
+            )
+            rest_com -= body_mass[:, np.newaxis]*body_pos
+            with np.errstate(invalid="ignore", divide="ignore"):
+                rest_com /= rest_mass[:, np.newaxis]
+            sep[own] = np.where(
+                rest_mass[:, np.newaxis] > 0, rest_com - body_pos, 0
+            )
+            node_mass[own] = rest_mass
+        dist2 = np.einsum("ij,ij->i", sep, sep) + softening**2
+        with np.errstate(divide="ignore"):
+            weight = np.where(dist2 > 0, node_mass*dist2**-1.5, 0)
+        for axis in range(3):
+            acc[:, axis] += np.bincount(
+                target[accept], weights=weight*sep[:, axis],
+                minlength=len(bodies),
+            )
+        # Swap every opened node for its children.
+        parent = node[is_open]
+        n_children = tree["n_children"][parent]
+        target = np.repeat(target[is_open], n_children)
+        first = np.cumsum(n_children) - n_children
+        node = (
+            np.repeat(tree["first_child"][parent], n_children) +
+            np.arange(n_children.sum()) - np.repeat(first, n_children)
+        )
+    return acc
+
+
+def morton_keys(cells):
+    # Interleave the bits of the x, y, and z cells into one Z-order key, so
+    # sorting by key groups bodies by octree node at every level at once.
+    keys = np.zeros(len(cells), dtype=np.uint64)
+    for axis in range(3):
+        keys |= spread_bits(cells[:, axis]) << np.uint64(2 - axis)
+    return keys
+
+
+def spread_bits(x):
+    # Put two zero bits between each of the low 21 bits of x.
+    x = x & np.uint64(0x1fffff)
+    x = (x | x << np.uint64(32)) & np.uint64(0x1f00000000ffff)
+    x = (x | x << np.uint64(16)) & np.uint64(0x1f0000ff0000ff)
+    x = (x | x << np.uint64(8)) & np.uint64(0x100f00f00f00f00f)
+    x = (x | x << np.uint64(4)) & np.uint64(0x10c30c30c30c30c3)
+    x = (x | x << np.uint64(2)) & np.uint64(0x1249249249249249)
+    return x
+
+
+if __name__ == "__main__":
+    main()
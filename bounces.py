@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+"""
+Event-driven motion for a ball under constant gravity, bouncing elastically
+off flat walls. Between bounces the ball follows an exact parabola. So rather
+than stepping through time, work out when it next touches a wall, jump
+straight there, and reflect. The cost goes with the number of bounces rather
+than the number of time steps, and the ball can never end up partway through
+a wall, no matter how fast it goes.
+
+Each wall is a plane normal.x = offset that the center of the ball can't
+cross, with the normal pointing into the box. For a wall of some thickness,
+the offset already includes the ball's radius and half the thickness.
+
+Running this file directly compares against the stepping loop in ball-box.py.
+"""
+
+import math
+import time
+
+import numpy as np
+
+
+def main():
+    # The box from ball-box.py: walls at x = -4 and x = 4 and a floor at
+    # y = -4, once the ball radius and wall thickness are taken off.
+    normals = np.array([[1, 0, 0], [-1, 0, 0], [0, 1, 0]], dtype=float)
+    offsets = np.array([-4, -4, -4], dtype=float)
+    gravity = np.array([0, -9.81, 0])
+    pos0 = np.array([1.0, 2.0, 0])
+    vel0 = np.array([3.0, 2.0, 0])
+    tmax = 10
+    start = time.perf_counter()
+    history = simulate(pos0, vel0, gravity, normals, offsets, tmax)
+    pos, vel = state_at(history, tmax)
+    elapsed = time.perf_counter() - start
+    print("%-22s %10s %14s %10s" % ("", "bounces", "energy drift", "time (s)"))
+    print("%-22s %10d %14.2e %10.4f" % (
+        "event driven", len(history["t"]) - 1,
+        energy(pos, vel, gravity)/energy(pos0, vel0, gravity) - 1, elapsed,
+    ))
+    for dt in (1e-3, 1e-2, 1e-1):
+        start = time.perf_counter()
+        pos, vel, nbounces = step_loop(pos0, vel0, gravity, normals, offsets,
+                                       dt, tmax)
+        elapsed = time.perf_counter() - start
+        print("%-22s %10d %14.2e %10.4f" % (
+            "stepping, dt=%g" % dt, nbounces,
+            energy(pos, vel, gravity)/energy(pos0, vel0, gravity) - 1,
+            elapsed,
+        ))
+    return
+
+
+def step_loop(pos, vel, gravity, normals, offsets, dt, tmax):
+    # The loop from ball-box.py, with plain floats, for comparison. Returns
+    # the final state and the number of bounces.
+    x, y = pos[:2]
+    vx, vy = vel[:2]
+    nbounces = 0
+    t = 0
+    while t < tmax:
+        t += dt
+        vy += gravity[1]*dt
+        x += vx*dt
+        y += vy*dt
+        for (nx, ny, _), offset in zip(normals, offsets):
+            if nx*x + ny*y < offset:
+                dv = -2*(nx*vx + ny*vy)
+                vx += nx*dv
+                vy += ny*dv
+                nbounces += 1
+    return np.array([x, y, 0]), np.array([vx, vy, 0]), nbounces
+
+
+def energy(pos, vel, gravity):
+    # Per unit mass, with height measured along gravity.
+    return 0.5*np.dot(vel, vel) - np.dot(gravity, pos)
+
+
+def next_hit(pos, vel, gravity, normals, offsets):
+    """Time until the ball next reaches a wall while moving toward it, and
+    which wall that is. Returns infinity and -1 if it never does. A ball
+    already touching a wall, and moving or being pulled into it, hits it
+    right away.
+    """
+    # Distance to each wall goes like gap + speed*t + 0.5*accel*t^2.
+    gap = np.maximum(normals @ pos - offsets, 0)
+    speed = normals @ vel
+    accel = normals @ gravity
+    pressed = (gap <= 0) & ((speed < 0) | ((speed == 0) & (accel < 0)))
+    if np.any(pressed):
+        return 0.0, int(np.flatnonzero(pressed)[0])
+    best_time, best_wall = math.inf, -1
+    for i in range(len(gap)):
+        for t in roots(0.5*accel[i], speed[i], gap[i]):
+            # Only count it if the ball is heading into the wall. That skips
+            # the wall the ball just bounced off of.
+            if 0 <= t < best_time and speed[i] + accel[i]*t < 0:
+                best_time, best_wall = t, i
+    return best_time, best_wall
+
+
+def roots(a, b, c):
+    # Real roots of a t^2 + b t + c, without losing precision when b^2 is
+    # much bigger than 4ac.
+    if a == 0:
+        return (-c/b,) if b != 0 else ()
+    discriminant = b*b - 4*a*c
+    if discriminant < 0:
+        return ()
+    q = -0.5*(b + math.copysign(math.sqrt(discriminant), b))
+    if q == 0:
+        return (0.0,)
+    return (q/a, c/q)
+
+
+def simulate(pos, vel, gravity, normals, offsets, tmax):
+    """Bounce the ball around until tmax. Returns a dict of arrays holding the
+    time, position, and velocity at the start and just after each bounce.
+    That's all it takes to get the state at any time with state_at().
+    """
+    pos = np.array(pos, dtype=float)
+    vel = np.array(vel, dtype=float)
+    gravity = np.asarray(gravity, dtype=float)
+    normals = np.asarray(normals, dtype=float)
+    offsets = np.asarray(offsets, dtype=float)
+    times, positions, velocities = [0.0], [pos.copy()], [vel.copy()]
+    pulls = []
+    t = 0.0
+    while True:
+        pull = resting_gravity(pos, vel, gravity, normals, offsets)
+        pulls.append(pull)
+        wait, wall = next_hit(pos, vel, pull, normals, offsets)
+        if t + wait > tmax:
+            break
+        t += wait
+        pos += vel*wait + 0.5*pull*wait**2
+        vel += pull*wait
+        # Flip the part of the velocity that goes into the wall.
+        vel -= 2*np.dot(vel, normals[wall])*normals[wall]
+        times.append(t)
+        positions.append(pos.copy())
+        velocities.append(vel.copy())
+    return {
+        "t": np.array(times),
+        "pos": np.array(positions),
+        "vel": np.array(velocities),
+        "gravity": np.array(pulls),
+    }
+
+
+def resting_gravity(pos, vel, gravity, normals, offsets):
+    # A ball touching a wall with no speed into or out of it, and pulled into
+    # it, rests on it. The wall holds up the part of gravity that goes into
+    # it, and the ball slides along with whatever is left.
+    gap = normals @ pos - offsets
+    speed = normals @ vel
+    pull = np.array(gravity, dtype=float)
+    for i in range(len(normals)):
+        if gap[i] <= 0 and speed[i] == 0 and normals[i] @ pull < 0:
+            pull -= (normals[i] @ pull)*normals[i]
+    return pull
+
+
+def state_at(history, t):
+    # Position and velocity at time t, or at each of an array of times, by
+    # following the parabola from the last bounce before then. Gravity is
+    # whatever was left of it after the bounce, once any wall the ball was
+    # resting on held up its share.
+    t = np.asarray(t, dtype=float)
+    last = np.searchsorted(history["t"], t, side="right") - 1
+    wait = (t - history["t"][last])[..., np.newaxis]
+    gravity = history["gravity"][last]
+    pos = (
+        history["pos"][last] + history["vel"][last]*wait +
+        0.5*gravity*wait**2
+    )
+    vel = history["vel"][last] + gravity*wait
+    return pos, vel
+
+
+if __name__ == "__main__":
+    main()
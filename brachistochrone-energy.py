@@ -11,8 +11,33 @@ WHEEL_RADIUS = 100
 GRAVITY = 9.81
 BEAD_MASS = 1
 
+# Working out each bead's angle and direction takes trig, every bead, every
+# step. With a table, the wire's shape is traced once up front, and every
+# bead gets looked up at once from splines.
+USE_TABLE = False
+
+# Energy conservation gives a bead's speed at every height, so the time to
+# the bottom is an integral along the wire, with no stepping at all. Compare
+# mode skips the animation. It times the cycloid from each bead's starting
+# angle, a straight wire, and the fastest wire a search can find through
+# COMPARE_NODES heights, then draws that one next to the cycloid.
+COMPARE_WIRES = False
+COMPARE_NODES = 10
+
+# Drawing the wire as hundreds of little cylinders makes hundreds of objects
+# for vpython to keep track of. As a single mesh, it's one.
+SINGLE_MESH = False
+
+# Save the points for the single mesh to meshes.CACHE_DIR the first time, and
+# load them from there, memory mapped, every time after that.
+CACHE_GEOMETRY = False
+
 
 def main():
+    if COMPARE_WIRES:
+        init_wire()
+        compare_wires()
+        return
     init_wire()
     init_graph()
     # Create a handful of color-coded beads, each starting at a different angle
@@ -27,9 +52,16 @@ def main():
     # We'll loop until we get to the bottom, but set tmax as a precaution.
     # Don't want to spin our wheels forever if something goes wrong.
     t, dt, tmax = 0, 0.1, 20
+    if USE_TABLE:
+        # Imported here so the default runs without numpy.
+        import wires
+        wire = wires.cycloid(WHEEL_RADIUS)
     while t < tmax:
         t += dt
         rate(1/dt)
+        if USE_TABLE:
+            step_beads(beads, wire, t, dt)
+            continue
         for bead in beads:
             # Stop updating as soon as any bead gets to the bottom. In theory,
             # they should all get there at pretty much the same time.
@@ -49,10 +81,73 @@ def main():
     return
 
 
+def step_beads(beads, wire, t, dt):
+    # Same as the loop in main(), for all the beads at once.
+    import numpy as np
+    import wires
+    x = np.array([bead.pos.x for bead in beads])
+    y = np.array([bead.pos.y for bead in beads])
+    # Only beads before the first one at the bottom get moved.
+    moving = np.cumprod(x <= 0).astype(bool)
+    energy_initial = np.array([bead.energy_initial for bead in beads])
+    mass = np.array([bead.mass for bead in beads])
+    energy_kinetic = energy_initial - mass*GRAVITY*y
+    _, direction = wires.at_height(wire, y)
+    velocity = np.sqrt(2*energy_kinetic/mass)[:, np.newaxis]*direction
+    x = np.where(moving, x + velocity[:, 0]*dt, x)
+    y = np.where(moving, y + velocity[:, 1]*dt, y)
+    theta, _ = wires.at_height(wire, y)
+    for i, bead in enumerate(beads):
+        if moving[i]:
+            bead.pos = vector(x[i], y[i], 0)
+            bead.graph.plot(t, 180 - theta[i]*RAD)
+    return
+
+
+def compare_wires():
+    # Everything runs from the top of the wheel to the bottom.
+    import numpy as np
+    import travel
+    theta = np.linspace(0, pi, 200)
+    x = np.array([wire_x(angle) for angle in theta])
+    y = np.array([wire_y(angle) for angle in theta])
+    starts = np.array([15, 45, 75, 105, 135, 165])*DEG
+    cycloid = travel.travel_times(x, y, starts/pi, gravity=GRAVITY)
+    print("exact for any start: %.6f s" % (pi*sqrt(WHEEL_RADIUS/GRAVITY)))
+    for angle, seconds in zip(starts, cycloid):
+        print("cycloid from %3.0f degrees: %.6f s" % (angle*RAD, seconds))
+    straight = travel.travel_times(
+        np.linspace(x[0], x[-1], 200), np.linspace(y[0], y[-1], 200),
+        gravity=GRAVITY,
+    )
+    print("straight wire: %.6f s" % straight[0])
+    best_x, best_y, best = travel.fastest(
+        (x[0], y[0]), (x[-1], y[-1]), COMPARE_NODES, gravity=GRAVITY
+    )
+    print("fastest wire found: %.6f s" % best)
+    # Draw it through enough points to look smooth.
+    smooth_x, smooth_y = travel.resample(best_x, best_y, 200)
+    curve(
+        pos=[vector(px, py, 0) for px, py in zip(smooth_x, smooth_y)],
+        radius=0.02*WHEEL_RADIUS,
+        color=color.cyan,
+    )
+    return
+
+
 def init_wire():
     # Trace the cycloid curve, drawing a bunch of tiny cylinders as we go, to
     # draw the wire.
     theta_min, theta_max = 0, 360*DEG
+    if SINGLE_MESH:
+        import meshes
+        params = {"radius": WHEEL_RADIUS, "nsegments": 500}
+        if CACHE_GEOMETRY:
+            points = meshes.cached(meshes.cycloid, params)
+        else:
+            points = meshes.cycloid(**params)
+        meshes.tube(points, 0.02*WHEEL_RADIUS, texture=textures.metal)
+        return
     dtheta = (theta_max - theta_min)/500
     theta = theta_min
     while theta < theta_max:
@@ -21,17 +21,49 @@ COLORS = (
     vpython.color.magenta,
 )
 
+# Working out each bead's angle and direction takes trig, every bead, every
+# step. With a table, the wire's shape is traced once up front, and every
+# bead gets looked up at once from splines.
+USE_TABLE = False
+
+# Arrival mode skips the animation. It slides ARRIVAL_BEADS beads from start
+# angles spread over the whole descent, all at once as arrays, and pins down
+# the moment each one reaches the bottom, partway through a step. Then it
+# graphs how far each arrival is from the exact time, pi*sqrt(R/g).
+ARRIVALS = False
+ARRIVAL_BEADS = 1000
+ARRIVAL_DT = 0.01
+
+# Drawing the wire as hundreds of little cylinders makes hundreds of objects
+# for vpython to keep track of. As a single mesh, it's one.
+SINGLE_MESH = False
+
+# Save the points for the single mesh to meshes.CACHE_DIR the first time, and
+# load them from there, memory mapped, every time after that.
+CACHE_GEOMETRY = False
+
 
 def main():
+    if ARRIVALS:
+        check_arrivals()
+        return
     draw_wire()
     init_graph()
-    beads = init_beads(6)
+    bead_list = init_beads(6)
     t, dt, tmax = 0, 0.1, 6
+    if USE_TABLE:
+        # Imported here so the default runs without numpy.
+        import wires
+        wire = wires.cycloid(WHEEL_RADIUS)
     while t < tmax:
         t += dt
         vpython.rate(1/dt)
+        if USE_TABLE:
+            if not advance_beads(bead_list, wire, t, dt):
+                break
+            continue
         all_done = True
-        for i, bead in enumerate(beads):
+        for i, bead in enumerate(bead_list):
             # Once this bead gets to the bottom, stop updating it. Once all the
             # beads get to the bottom, we're all done.
             if advance_bead(bead, dt):
@@ -44,6 +76,35 @@ def main():
     return
 
 
+def check_arrivals():
+    # The wire keeps going up the far side, so a step can overshoot the
+    # bottom and still have a wire under it.
+    import numpy as np
+    import beads
+    import curves
+    import wires
+    wire = wires.cycloid(WHEEL_RADIUS, stop=270*DEG)
+    theta_start = 180*DEG*(np.arange(ARRIVAL_BEADS) + 0.5)/ARRIVAL_BEADS
+    arrival = beads.slide(
+        wire, wire["length"](theta_start), np.zeros(ARRIVAL_BEADS),
+        wire["length"](180*DEG), ARRIVAL_DT, 20, GRAVITY,
+    )
+    exact = math.pi*math.sqrt(WHEEL_RADIUS/GRAVITY)
+    print("exact: %.12f s" % exact)
+    print("arrivals: %.12f s to %.12f s" % (arrival.min(), arrival.max()))
+    vpython.graph(
+        title="Arrival Times on a Cycloid Wire",
+        xtitle="Starting Angle (<sup>o</sup>)",
+        ytitle="Arrival Time - Exact (s)",
+        fast=False,
+    )
+    curves.set_data(
+        vpython.gcurve(color=vpython.color.blue, width=2),
+        theta_start*RAD, arrival - exact,
+    )
+    return
+
+
 def advance_bead(bead, dt):
     # Short-circuit this bead's motion as soon as it gets to the bottom
     if bead.pos.x > 0:
@@ -58,8 +119,40 @@ def advance_bead(bead, dt):
     return True
 
 
+def advance_beads(bead_list, wire, t, dt):
+    # Same as advance_bead(), for all the beads at once. Returns False once
+    # they're all at the bottom.
+    import numpy as np
+    import wires
+    pos = np.array([[bead.pos.x, bead.pos.y] for bead in bead_list])
+    v = np.array([[bead.v.x, bead.v.y] for bead in bead_list])
+    moving = pos[:, 0] <= 0
+    v[:, 1] -= GRAVITY*dt
+    _, w_hat = wires.at_height(wire, pos[:, 1])
+    v = w_hat*np.einsum("ij,ij->i", v, w_hat)[:, np.newaxis]
+    pos[moving] += v[moving]*dt
+    theta, _ = wires.at_height(wire, pos[:, 1])
+    for i, bead in enumerate(bead_list):
+        if moving[i]:
+            bead.v = vpython.vector(v[i, 0], v[i, 1], 0)
+            bead.pos = vpython.vector(pos[i, 0], pos[i, 1], 0)
+        else:
+            print("bead", i, "done after %.2f" % t, "s")
+        bead.graph.plot(t, 180 - theta[i]*RAD)
+    return np.any(moving)
+
+
 def draw_wire():
     theta_min, theta_max = 0, 360*DEG
+    if SINGLE_MESH:
+        import meshes
+        params = {"radius": WHEEL_RADIUS, "nsegments": 500}
+        if CACHE_GEOMETRY:
+            points = meshes.cached(meshes.cycloid, params)
+        else:
+            points = meshes.cycloid(**params)
+        meshes.tube(points, 0.02*WHEEL_RADIUS, texture=vpython.textures.metal)
+        return
     dtheta = (theta_max - theta_min)/500
     theta = theta_min
     while theta < theta_max:
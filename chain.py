@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+
+"""
+Array-backed hanging chain. Link positions and velocities live in (N, 3)
+NumPy arrays, and every spring and gravity force is computed at once. The
+first and last links are pinned to the posts.
+
+If only the resting shape matters, equilibrium() skips the dynamics and finds
+it with Newton's method. Each link only feels its neighbors, so the system is
+banded and every Newton step is one cheap banded solve.
+
+Running this file directly times the relaxation for chains of up to 10^5
+links, then times the direct solve for the same chains. Last, it compares
+the fixed 2000 steps hanging-chain.py takes against stopping as soon as the
+chain has settled.
+"""
+
+import time
+
+import numpy as np
+import scipy.linalg
+
+
+# Newton's method in equilibrium() starts with soft springs and stiffens them
+# by this factor at a time. Each stiffness but the last only needs to get
+# close, to within STAGE_TOL link weights.
+STIFFEN_FACTOR = 100
+STAGE_TOL = 1e-3
+# How far a Newton step can stiffen the diagonal, as a multiple of the spring
+# constant, before giving up on finding a step that goes downhill.
+MAX_DAMPING = 1e6
+
+
+def main():
+    print("%8s %12s" % ("links", "ms/step"))
+    for nlinks in (21, 1000, 10000, 100000):
+        # Same posts, chain length, and springs as hanging-chain.py, just cut
+        # into more links.
+        pos = flat_chain(nlinks, left=-10, right=10, height=10)
+        velocity = np.zeros_like(pos)
+        nsteps = 200
+        start = time.perf_counter()
+        relax(
+            pos, velocity, dt=0.01, nsteps=nsteps, friction=0.05,
+            spring_constant=10000, relaxed_length=40/(nlinks - 1), mass=1,
+            gravity=9.8,
+        )
+        elapsed = time.perf_counter() - start
+        print("%8d %12.3f" % (nlinks, 1000*elapsed/nsteps))
+    print(
+        "%8s %12s %12s %12s" % ("links", "iterations", "residual", "time (s)")
+    )
+    for nlinks in (21, 1000, 10000, 100000):
+        pos = sagged_chain(nlinks, left=-10, right=10, height=10, length=40)
+        start = time.perf_counter()
+        pos, info = equilibrium(
+            pos, spring_constant=10000, relaxed_length=40/(nlinks - 1),
+            mass=1, gravity=9.8,
+        )
+        elapsed = time.perf_counter() - start
+        print(
+            "%8d %12d %12.2e %12.3f"
+            % (nlinks, info["iterations"], info["residual"], elapsed)
+        )
+    print(
+        "%8s %10s %12s %12s %12s"
+        % ("links", "tol", "steps", "residual", "time (s)")
+    )
+    for nlinks in (21, 101, 1001):
+        params = {
+            "spring_constant": 10000, "relaxed_length": 40/(nlinks - 1),
+            "mass": 1, "gravity": 9.8,
+        }
+        for tol in (0, 1e-3, 1e-6):
+            pos = flat_chain(nlinks, left=-10, right=10, height=10)
+            velocity = np.zeros_like(pos)
+            start = time.perf_counter()
+            # A tolerance of zero never triggers, so it runs every step.
+            info = settle(
+                pos, velocity, dt=0.01, max_steps=2000 if tol == 0 else 10**5,
+                friction=0.05, tol=tol, **params
+            )
+            elapsed = time.perf_counter() - start
+            print(
+                "%8d %10.0e %12d %12.2e %12.3f"
+                % (nlinks, tol, info["iterations"], info["residual"], elapsed)
+            )
+    return
+
+
+def flat_chain(nlinks, left, right, height):
+    # Links spaced evenly in a straight line between the tops of the posts.
+    pos = np.zeros((nlinks, 3))
+    pos[:, 0] = np.linspace(left, right, nlinks)
+    pos[:, 1] = height
+    return pos
+
+
+def sagged_chain(nlinks, left, right, height, length):
+    # A starting guess for equilibrium(). The links hang in a V, spaced evenly
+    # along it, a touch longer than the relaxed chain so that every spring
+    # starts out stretched. If the chain can't reach across, it's a straight
+    # line.
+    span = right - left
+    sag_length = max(span, 1.01*length)
+    depth = np.sqrt(max(0, (0.5*sag_length)**2 - (0.5*span)**2))
+    s = np.linspace(-1, 1, nlinks)
+    pos = np.zeros((nlinks, 3))
+    pos[:, 0] = 0.5*(left + right) + 0.5*span*s
+    pos[:, 1] = height - depth*(1 - np.abs(s))
+    return pos
+
+
+def forces(pos, spring_constant, relaxed_length, mass, gravity):
+    # Spring i runs from link i to link i+1. A stretched spring pulls link i
+    # forward along the spring and link i+1 back.
+    axis = pos[1:] - pos[:-1]
+    length = np.linalg.norm(axis, axis=1)[:, np.newaxis]
+    pull = spring_constant*(length - relaxed_length)*axis/length
+    force = np.zeros_like(pos)
+    force[:-1] += pull
+    force[1:] -= pull
+    force[:, 1] -= mass*gravity
+    return force
+
+
+def relax(pos, velocity, dt, nsteps, friction, spring_constant, relaxed_length,
+          mass, gravity):
+    # Same damped dynamics as relax_chain() in hanging-chain.py: all forces
+    # come from the old positions, then friction bleeds off a little velocity.
+    # The end links stay put. Arrays are updated in place.
+    for _ in range(nsteps):
+        force = forces(pos, spring_constant, relaxed_length, mass, gravity)
+        kick_and_drift(pos, velocity, force, dt, friction, mass)
+    return pos, velocity
+
+
+def settle(pos, velocity, dt, max_steps, friction, tol, spring_constant,
+           relaxed_length, mass, gravity):
+    """Same as relax(), but stops as soon as no link feels a net force of
+    more than tol times its own weight, or after max_steps. Returns a dict of
+    the steps taken and the final residual force, in link weights.
+    """
+    steps = 0
+    while True:
+        force = forces(pos, spring_constant, relaxed_length, mass, gravity)
+        residual = np.max(np.linalg.norm(force[1:-1], axis=1))/(mass*gravity)
+        if residual <= tol or steps >= max_steps:
+            break
+        kick_and_drift(pos, velocity, force, dt, friction, mass)
+        steps += 1
+    return {"iterations": steps, "residual": residual}
+
+
+def kick_and_drift(pos, velocity, force, dt, friction, mass):
+    # One damped step, given the forces at the current positions.
+    velocity += force*dt/mass
+    velocity *= 1 - friction
+    velocity[[0, -1]] = 0
+    pos += velocity*dt
+    return
+
+
+def energy(pos, spring_constant, relaxed_length, mass, gravity):
+    # Spring plus gravitational potential energy. The resting shape is the one
+    # that makes this as small as possible.
+    stretch = np.linalg.norm(pos[1:] - pos[:-1], axis=1) - relaxed_length
+    return (
+        0.5*spring_constant*np.sum(stretch**2) +
+        mass*gravity*np.sum(pos[:, 1])
+    )
+
+
+def equilibrium(pos, spring_constant, relaxed_length, mass, gravity, tol=1e-9,
+                max_iterations=100, soft_start=True):
+    """Resting shape of the chain, found directly with Newton's method rather
+    than by letting it settle. Starts from pos, which also sets where the end
+    links are pinned. Stops once no link feels more than tol times its own
+    weight, or once no link moves more than tol times the relaxed length of
+    the whole chain. On a long chain roundoff in the tension can keep the
+    force from getting any smaller. Returns the positions along with a dict
+    of the iterations used and the final residual force. Raises RuntimeError
+    if it hasn't settled after max_iterations.
+
+    Newton's method crawls on a stiff chain that starts far from rest. Every
+    step is a straight line, and swinging a stiff spring around in a straight
+    line stretches it, so the step gets cut short. So with soft_start, the
+    chain is solved first with soft springs, then stiffened STIFFEN_FACTOR at
+    a time, each solve starting from the last. Turn it off if pos is already
+    close to the answer.
+    """
+    pos = np.array(pos, dtype=float)
+    # Soft enough that the weight of the whole chain would stretch one spring
+    # by its relaxed length.
+    stiffness = spring_constant
+    if soft_start:
+        stiffness = min(stiffness, len(pos)*mass*gravity/relaxed_length)
+    iterations = 0
+    while True:
+        last = stiffness >= spring_constant
+        pos, info = newton(
+            pos, (stiffness, relaxed_length, mass, gravity),
+            tol if last else STAGE_TOL, max_iterations - iterations,
+        )
+        iterations += info["iterations"]
+        if last:
+            break
+        stiffness = min(spring_constant, STIFFEN_FACTOR*stiffness)
+    if not info["settled"]:
+        raise RuntimeError(
+            "Chain didn't settle in %d Newton iterations. Residual force: %g "
+            "link weights" % (iterations, info["residual"])
+        )
+    return pos, {"iterations": iterations, "residual": info["residual"]}
+
+
+def newton(pos, params, tol, max_iterations):
+    # Newton's method at one stiffness, for equilibrium(). Returns the new
+    # positions and a dict of the iterations used, the final residual force,
+    # and whether it settled.
+    spring_constant, relaxed_length, mass, gravity = params
+    # Everything happens in the x-y plane. The free coordinates are x and y
+    # of each link between the two ends, interleaved.
+    settled = tol*relaxed_length*(len(pos) - 1)
+    iteration = 0
+    moved = np.inf
+    while True:
+        force = forces(pos, *params)[1:-1, :2]
+        residual = (
+            np.max(np.linalg.norm(force, axis=1))/(mass*gravity)
+            if len(force) else 0
+        )
+        done = residual <= tol or moved <= settled
+        if done or iteration >= max_iterations:
+            break
+        iteration += 1
+        bands = hessian_bands(pos, spring_constant, relaxed_length)
+        # Newton's method can overshoot when the guess is far off. If a step
+        # doesn't bring the energy down, try shorter ones in the same
+        # direction. If none of those help either, stiffen the diagonal. That
+        # turns the step toward straight downhill. A straight chain of
+        # squashed springs has no sideways stiffness at all, so plain Newton
+        # can't even take a step from there.
+        energy_before = energy(pos, *params)
+        damping = 0
+        while True:
+            trial, step = newton_step(
+                pos, force, bands, damping*spring_constant, energy_before,
+                params,
+            )
+            if trial is not None:
+                break
+            # Straight downhill with a step this short should always help,
+            # unless the energy isn't a number at all.
+            if damping >= MAX_DAMPING:
+                raise RuntimeError(
+                    "No step lowers the chain's energy. Energy: %g"
+                    % energy_before
+                )
+            damping = max(1e-6, 10*damping)
+        pos = trial
+        moved = np.max(np.abs(step))
+    return pos, {
+        "iterations": iteration, "residual": residual, "settled": done,
+    }
+
+
+def newton_step(pos, force, bands, damping, energy_before, params):
+    # Solve for the Newton step with some extra stiffness on the diagonal,
+    # then back off along it until the energy goes down. Returns the new
+    # positions and the step taken, or None if nothing worked.
+    damped = bands.copy()
+    damped[3] += damping
+    try:
+        step = scipy.linalg.solve_banded(
+            (3, 3), damped, force.ravel()
+        ).reshape(-1, 2)
+    except (np.linalg.LinAlgError, ValueError):
+        # Singular, or full of NaNs.
+        return None, None
+    for _ in range(10):
+        trial = pos.copy()
+        trial[1:-1, :2] += step
+        # Leave a little room for roundoff once the energy stops changing.
+        energy_after = energy(trial, *params)
+        if energy_after <= energy_before + 1e-12*abs(energy_before):
+            return trial, step
+        step = step/2
+    return None, None
+
+
+def hessian_bands(pos, spring_constant, relaxed_length):
+    # Second derivatives of the energy with respect to the free coordinates,
+    # in the banded layout scipy.linalg.solve_banded() wants with three bands
+    # on each side of the diagonal. Each spring contributes a 2x2 block
+    #     K = k*(u u^T + (1 - L0/L)*(1 - u u^T))
+    # The sideways part goes negative for a squashed spring. Leaving that out
+    # keeps every Newton step heading downhill.
+    axis = pos[1:, :2] - pos[:-1, :2]
+    length = np.linalg.norm(axis, axis=1)
+    u = axis/length[:, np.newaxis]
+    outer = u[:, :, np.newaxis]*u[:, np.newaxis, :]
+    sideways = np.maximum(0, 1 - relaxed_length/length)
+    stiffness = spring_constant*(
+        outer + sideways[:, np.newaxis, np.newaxis]*(np.eye(2) - outer)
+    )
+    # Link i sits between spring i-1 and spring i.
+    diagonal = stiffness[:-1] + stiffness[1:]
+    coupling = -stiffness[1:-1]
+    nfree = len(diagonal)
+    bands = np.zeros((7, 2*nfree))
+    for a in range(2):
+        for b in range(2):
+            # Entry (row, col) of the matrix goes in bands[3 + row - col, col].
+            bands[3 + a - b, b::2] = diagonal[:, a, b]
+            bands[1 + a - b, 2 + b::2] = coupling[:, a, b]
+            bands[5 + a - b, b:2*nfree - 2:2] = coupling[:, a, b]
+    return bands
+
+
+def length(pos):
+    # Total length of the chain, adding up the distance between neighbors.
+    return np.sum(np.linalg.norm(pos[1:] - pos[:-1], axis=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+
+"""
+Bulk updates for animated graphs. Deleting a gcurve and plotting it again one
+point at a time sends an update per point. Assigning to the curve's data
+replaces all of it in a single update.
+"""
+
+import numpy as np
+
+
+def set_data(curve, x, y):
+    # Replace everything on the curve with the given points.
+    curve.data = np.column_stack((x, y)).tolist()
+    return
+
+
+def fixed_x_updater(curve, x):
+    # For curves whose x values never change, like a wave on a fixed grid.
+    # Returns a function that takes new y values and replaces the curve. The
+    # x column is only built once.
+    points = np.empty((len(x), 2))
+    points[:, 0] = x
+
+    def update(y):
+        points[:, 1] = y
+        curve.data = points.tolist()
+        return
+
+    return update
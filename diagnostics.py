@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+"""
+Post-hoc diagnostics for the animation loops. Rather than working out energy
+and plotting it on every step, a loop can record its raw state as it goes.
+Energy then gets computed for the whole run at once with array math, and only
+as many points as a graph can usefully show get sent to it.
+"""
+
+import numpy as np
+
+
+# A graph a few hundred pixels wide can't show more points than this anyway.
+MAX_POINTS = 1000
+
+
+def new_recording(*names):
+    # One list per recorded quantity. Appending to a list is about the cheapest
+    # thing a loop can do.
+    return {name: [] for name in names}
+
+
+def record(recording, **values):
+    for name, value in values.items():
+        recording[name].append(value)
+    return
+
+
+def to_arrays(recording):
+    # Stack each recorded quantity into an array, with time along axis 0.
+    return {name: np.array(values) for name, values in recording.items()}
+
+
+def decimate(npoints, max_points=MAX_POINTS):
+    # Indices of evenly spaced samples, always including the last one.
+    if npoints <= max_points:
+        return np.arange(npoints)
+    samples = np.linspace(0, npoints - 1, max_points)
+    return np.unique(samples.round().astype(int))
+
+
+def plot(curve, x, y, max_points=MAX_POINTS):
+    # Send a decimated copy of the data to a gcurve in one call.
+    keep = decimate(len(x), max_points)
+    curve.plot(np.column_stack((x[keep], y[keep])).tolist())
+    return
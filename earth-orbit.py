@@ -34,8 +34,29 @@ print("We are measuring energy in units of:", 1/JOULE, "J")
 # to make execution smoother.
 PLOT_INTERVAL = 20
 
+# Time integrator. The default is the semi-implicit Euler method, stepped
+# right here in the loop. Try "leapfrog", "yoshida4", or "adaptive" from
+# integrators.py for much less energy drift. The adaptive one slows down to
+# get through tight perihelion passes cleanly.
+INTEGRATOR = "euler"
+
+# With the sun fixed, each planet is its own two-body problem, which has an
+# exact solution. Set this to look up each planet's state with kepler.py rather
+# than stepping it forward. The numerical loop is still there as a check.
+USE_KEPLER = False
+
+# Sweep mode skips the drawing and runs every launch angle in SWEEP_ANGLES at
+# once. The energy and separation that main() would plot for each planet get
+# saved to SWEEP_FILE instead.
+SWEEP = False
+SWEEP_ANGLES = [40*DEGREES*i/4999 for i in range(5000)]
+SWEEP_FILE = "earth-orbit-sweep.npz"
+
 
 def main():
+    if SWEEP:
+        sweep(SWEEP_ANGLES, SWEEP_FILE)
+        return
     init_graph()
     draw_potential()
     planets = [
@@ -49,23 +70,49 @@ def main():
     # We want to watch years of motion in just a few seconds.
     dt = 0.001*YEAR
     step = 0
-    max_steps = 10*YEAR/dt
+    max_steps = step_count(dt)
+    if USE_KEPLER:
+        # Work out every planet at every step in one go, before the loop
+        # starts. Each frame then just copies its row into the spheres.
+        # Imported here so the default runs without numpy.
+        import kepler
+        positions, velocities = kepler.propagate_grid(
+            [planet.pos_initial for planet in planets],
+            [planet.velocity_initial for planet in planets],
+            [n*dt for n in range(1, max_steps + 1)],
+            G*sun.mass,
+        )
+        positions, velocities = positions.tolist(), velocities.tolist()
     while step < max_steps:
         # When measuring time in seconds, rate(1/dt) plays back in real time.
         # But we're measuring time in years, so it'll play one year of movement
         # per second.
         rate(1/dt)
         step += 1
-        for planet in planets:
+        for i, planet in enumerate(planets):
             r = planet.pos - sun.pos
-            force = -r.hat * G*planet.mass*sun.mass/r.mag**2
             # We want each two-body problem to be independent, but they all
             # share the same sun. To avoid any coupling between the planets,
             # fix the position of the sun. This is only a tiny bit inaccurate
             # since the sun is several orders of magnitude more massive than
             # the earth.
-            planet.momentum += force*dt
-            planet.pos += planet.momentum*dt/planet.mass
+            if USE_KEPLER:
+                planet.pos = vector(*positions[step - 1][i])
+                velocity = vector(*velocities[step - 1][i])
+                planet.momentum = velocity*planet.mass
+            elif INTEGRATOR == "euler":
+                force = -r.hat * G*planet.mass*sun.mass/r.mag**2
+                planet.momentum += force*dt
+                planet.pos += planet.momentum*dt/planet.mass
+            else:
+                pos, velocity = planet.step(
+                    planet.pos,
+                    planet.momentum/planet.mass,
+                    lambda pos: gravity(pos, sun),
+                    dt,
+                )
+                planet.pos = pos
+                planet.momentum = velocity*planet.mass
             energy = system_energy(sun, planet)
             # To improve performance, don't update the graph every time
             if step % PLOT_INTERVAL == 0:
@@ -73,6 +120,87 @@ def main():
     return
 
 
+def step_count(dt):
+    # Steps to cover ten years, shared by main() and sweep() so both run for
+    # the same span.
+    return int(ceil(10*YEAR/dt))
+
+
+def sweep(launch_angles, filename):
+    # Same setup as get_planet(), but with one row per launch angle. The sun
+    # sits fixed at the origin. Imported here so the default runs without
+    # numpy.
+    import numpy as np
+    launch_angles = np.asarray(launch_angles)
+    nplanets = len(launch_angles)
+    pos = np.zeros((nplanets, 3))
+    pos[:, 1] = EARTH_ORBIT_RADIUS
+    velocity = np.zeros((nplanets, 3))
+    velocity[:, 0] = EARTH_MOMENTUM/EARTH_MASS
+    velocity[:, 1] = EARTH_MOMENTUM*np.tan(launch_angles)/EARTH_MASS
+    dt = 0.001*YEAR
+    max_steps = step_count(dt)
+    # Keep the points main() would plot: separation before each step, energy
+    # after it, every PLOT_INTERVAL steps. Single precision is plenty for
+    # looking at, and halves the file size.
+    samples = np.arange(PLOT_INTERVAL, max_steps + 1, PLOT_INTERVAL)
+    separation = np.empty((len(samples), nplanets), dtype=np.float32)
+    energy = np.empty((len(samples), nplanets), dtype=np.float32)
+    if USE_KEPLER:
+        # No stepping needed. Look up the state just before and just after
+        # each sampled step.
+        import kepler
+        before, _ = kepler.propagate_grid(
+            pos, velocity, (samples - 1)*dt, G*SUN_MASS
+        )
+        after, velocity_after = kepler.propagate_grid(
+            pos, velocity, samples*dt, G*SUN_MASS
+        )
+        separation[:] = np.linalg.norm(before, axis=-1)
+        energy[:] = sweep_energy(after, velocity_after)
+    else:
+        import integrators
+        step = integrators.get_integrator(INTEGRATOR)
+
+        def accel(pos):
+            r = np.linalg.norm(pos, axis=1)[:, np.newaxis]
+            return -G*SUN_MASS*pos/r**3
+
+        sample = 0
+        for i in range(1, max_steps + 1):
+            r = np.linalg.norm(pos, axis=1)
+            pos, velocity = step(pos, velocity, accel, dt)
+            if i % PLOT_INTERVAL == 0:
+                separation[sample] = r
+                energy[sample] = sweep_energy(pos, velocity)
+                sample += 1
+    np.savez_compressed(
+        filename,
+        launch_angle=launch_angles,
+        time=samples*dt,
+        separation=separation,
+        energy=energy,
+    )
+    print("Saved", nplanets, "trajectories to", filename)
+    return
+
+
+def sweep_energy(pos, velocity):
+    # Same as system_energy(), for whole arrays of planets around a sun that
+    # doesn't move.
+    import numpy as np
+    return (
+        0.5*EARTH_MASS*np.sum(velocity**2, axis=-1) +
+        -G*EARTH_MASS*SUN_MASS/np.linalg.norm(pos, axis=-1)
+    )
+
+
+def gravity(pos, sun):
+    # Acceleration of a planet at pos, pulled toward the fixed sun.
+    r = pos - sun.pos
+    return -r.hat * G*sun.mass/r.mag**2
+
+
 def system_energy(body1, body2):
     return (
         0.5*body1.momentum.mag**2/body1.mass +
@@ -134,6 +262,17 @@ def get_planet(color, launch_angle):
     # We need a curve for each planet object. Might as well attach the
     # curves to the planets rather than storing them somewhere else.
     planet.curve = gcurve(color=color, width=2)
+    # Same deal for the integrator. The adaptive one keeps track of its step
+    # size, so each planet gets its own. Imported here so the default runs
+    # without numpy.
+    if INTEGRATOR != "euler":
+        import integrators
+        planet.step = integrators.get_integrator(INTEGRATOR)
+    # The exact solution only needs to know where the planet started, relative
+    # to the sun at the origin.
+    velocity = planet.momentum/planet.mass
+    planet.pos_initial = (planet.pos.x, planet.pos.y, planet.pos.z)
+    planet.velocity_initial = (velocity.x, velocity.y, velocity.z)
     return planet
 
 
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+"""
+Many runs of ball-box.py at once, each from its own random start, spread
+over a pool of processes. Each run reports how many times the ball bounced,
+how long it flew before its first bounce, and how far its energy drifted.
+All of that gets collected into one set of arrays, one entry per run.
+
+Runs are handed out in chunks. Every chunk gets its own random number stream,
+split off from one seed with numpy's SeedSequence, so the streams never
+overlap and the same seed gives the same results no matter how many
+processes there are.
+
+Running this file directly runs the ensemble for the box in ball-box.py and
+saves it to FILENAME, for ball-box.py to plot in ensemble mode. That's kept
+out of ball-box.py itself so the pool never starts from a script that has
+vpython open. Running it with "benchmark" times the same ensemble with more
+and more processes instead.
+"""
+
+import concurrent.futures
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+
+import bounces
+
+
+# Runs per chunk. Enough to make sending a chunk to a process worthwhile, but
+# small enough that the processes all finish at about the same time.
+CHUNK_SIZE = 100
+
+# RUNS starts from ball-box.py, on every core. With DT set, each run uses the
+# stepping loop with that time step instead of exact bounces. The same seed
+# gives the same results on any number of cores.
+RUNS = 10000
+DT = None
+SEED = 0
+FILENAME = "ball-box-ensemble.npz"
+
+# The box from ball-box.py, same as in bounces.py. The center of the ball
+# can't get within 4 of the middle, and it starts anywhere inside that, up
+# to the top of the walls.
+NORMALS = np.array([[1, 0, 0], [-1, 0, 0], [0, 1, 0]], dtype=float)
+OFFSETS = np.array([-4, -4, -4], dtype=float)
+GRAVITY = np.array([0, -9.81, 0])
+LO, HI = np.array([-4, -4]), np.array([4, 5])
+
+
+def main():
+    if "benchmark" in sys.argv[1:]:
+        benchmark()
+        return
+    results = run(RUNS, NORMALS, OFFSETS, GRAVITY, LO, HI, tmax=10, dt=DT,
+                  seed=SEED)
+    summarize(results)
+    save(FILENAME, results)
+    print("Saved to", FILENAME)
+    return
+
+
+def benchmark():
+    print("%8s %8s %10s %12s" % ("workers", "runs", "time (s)", "runs/s"))
+    ncores = os.cpu_count() or 1
+    for nworkers in sorted({1, 2, 4, ncores}):
+        start = time.perf_counter()
+        results = run(4000, NORMALS, OFFSETS, GRAVITY, LO, HI, tmax=10,
+                      seed=0, nworkers=nworkers)
+        elapsed = time.perf_counter() - start
+        print("%8d %8d %10.2f %12.0f" % (
+            nworkers, len(results["bounces"]), elapsed,
+            len(results["bounces"])/elapsed,
+        ))
+    summarize(results)
+    return
+
+
+def run(nruns, normals, offsets, gravity, lo, hi, tmax, dt=None, seed=None,
+        nworkers=None):
+    """Run nruns balls from random starts until tmax and return a dict of
+    arrays, one entry per run. Starting positions are anywhere from lo to
+    hi, in x and y. The ball is moved with the exact bounces in bounces.py,
+    or with the stepping loop from ball-box.py if a time step dt is given.
+    A seed of None picks a fresh one, which gets saved with the results.
+    """
+    sequence = np.random.SeedSequence(seed)
+    sizes = [CHUNK_SIZE]*(nruns//CHUNK_SIZE)
+    if nruns % CHUNK_SIZE:
+        sizes.append(nruns % CHUNK_SIZE)
+    streams = sequence.spawn(len(sizes))
+    setup = (normals, offsets, gravity, lo, hi, tmax, dt)
+    with concurrent.futures.ProcessPoolExecutor(nworkers) as pool:
+        chunks = list(pool.map(
+            run_chunk, streams, sizes, itertools.repeat(setup)
+        ))
+    results = {
+        name: np.concatenate([chunk[name] for chunk in chunks])
+        for name in chunks[0]
+    }
+    results["entropy"] = np.array(str(sequence.entropy))
+    results["dt"] = np.array(np.nan if dt is None else dt)
+    results["tmax"] = np.array(tmax)
+    return results
+
+
+def run_chunk(stream, nruns, setup):
+    # Runs one after another in a worker, from one random stream.
+    normals, offsets, gravity, lo, hi, tmax, dt = setup
+    rng = np.random.default_rng(stream)
+    pos0, vel0 = random_starts(rng, nruns, lo, hi, gravity)
+    results = {
+        "pos0": pos0,
+        "vel0": vel0,
+        "bounces": np.zeros(nruns, dtype=int),
+        "flight": np.zeros(nruns),
+        "drift": np.zeros(nruns),
+    }
+    for i in range(nruns):
+        results["flight"][i], _ = bounces.next_hit(
+            pos0[i], vel0[i], gravity, normals, offsets
+        )
+        if dt is None:
+            history = bounces.simulate(
+                pos0[i], vel0[i], gravity, normals, offsets, tmax
+            )
+            pos, vel = bounces.state_at(history, tmax)
+            nbounces = len(history["t"]) - 1
+        else:
+            pos, vel, nbounces = bounces.step_loop(
+                pos0[i], vel0[i], gravity, normals, offsets, dt, tmax
+            )
+        results["bounces"][i] = nbounces
+        # Per unit mass. A ratio would blow up for a ball that starts near
+        # zero energy.
+        results["drift"][i] = (
+            bounces.energy(pos, vel, gravity) -
+            bounces.energy(pos0[i], vel0[i], gravity)
+        )
+    return results
+
+
+def random_starts(rng, nruns, lo, hi, gravity):
+    # Same as ball-box.py: anywhere in the box, moving up and to the right,
+    # never fast enough to get higher than the top of the box.
+    pos = np.zeros((nruns, 3))
+    pos[:, :2] = rng.uniform(lo, hi, (nruns, 2))
+    v_max = np.sqrt(2*np.linalg.norm(gravity)*(hi[1] - pos[:, 1]))
+    vel = np.zeros((nruns, 3))
+    vel[:, :2] = rng.uniform(0, 1, (nruns, 2))*v_max[:, np.newaxis]
+    return pos, vel
+
+
+def summarize(results):
+    # Mean, spread, and worst case of each statistic.
+    flight = results["flight"][np.isfinite(results["flight"])]
+    print("%-22s %12s %12s %12s" % ("", "mean", "std", "max"))
+    for name, values in (
+        ("bounces", results["bounces"]),
+        ("time of flight (s)", flight),
+        ("energy drift (J/kg)", results["drift"]),
+        ("|energy drift|", np.abs(results["drift"])),
+    ):
+        print("%-22s %12.4g %12.4g %12.4g" % (
+            name, values.mean(), values.std(), values.max()
+        ))
+    return
+
+
+def save(filename, results):
+    np.savez(filename, **results)
+    return
+
+
+if __name__ == "__main__":
+    main()
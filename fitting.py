@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+
+"""
+Catenary and parabola fits for hanging-chain.py. Given the length of a chain
+hung between two posts at the same height, find the catenary or parabola
+through the tops of the posts with that same length.
+
+There's no formula for the steepness, so it's solved for numerically. Both
+lengths only ever go up with steepness, which gives a bracket around the
+answer. Newton steps are taken when they stay inside it, and bisection steps
+when they don't. Everything works on arrays, so thousands of lengths get fit
+at once.
+
+Running this file directly times a batch of fits against the bisection
+search in hanging-chain.py.
+"""
+
+import time
+
+import numpy as np
+
+
+# Steepness is solved to this relative tolerance. The iteration limit is only
+# reached if Newton keeps falling back to bisection.
+TOLERANCE = 1e-13
+MAX_ITERATIONS = 100
+
+
+def main():
+    width = 20
+    lengths = np.linspace(20.5, 100, 10000)
+    for name, fit, length_of in (
+        ("catenary", fit_catenary, catenary_length),
+        ("parabola", fit_parabola, parabola_length),
+    ):
+        start = time.perf_counter()
+        steepness = fit(lengths, width)
+        elapsed = time.perf_counter() - start
+        error = np.max(np.abs(length_of(steepness, width)/lengths - 1))
+        # The same thing one length at a time, the way hanging-chain.py does
+        # it, with 50 bisection steps each.
+        start = time.perf_counter()
+        for length in lengths:
+            bisection(length, lambda x: length_of(x, width), 1/40)
+        elapsed_bisection = time.perf_counter() - start
+        print(
+            "%d %s fits: %.4f s (bisection: %.2f s), worst length error %.1e"
+            % (len(lengths), name, elapsed, elapsed_bisection, error)
+        )
+    return
+
+
+def bisection(target, func, guess):
+    # Same as bisection_search() in hanging-chain.py, for comparison.
+    lo, hi = 0.01*guess, 100*guess
+    for _ in range(50):
+        mid = 0.5*(lo + hi)
+        if target > func(mid):
+            lo = mid
+        else:
+            hi = mid
+    return mid
+
+
+def fit_catenary(lengths, width):
+    """Steepness alpha of the catenary cosh(alpha*x)/alpha through the tops
+    of two posts width apart, with the given length between them. Takes a
+    single length or an array of them. Lengths must be more than width.
+    """
+    lengths = check_lengths(lengths, width)
+    # For a shallow sag, L = w*(1 + (alpha*w)^2/24) to leading order.
+    guess = np.sqrt(24*(lengths/width - 1))/width
+    return solve_increasing(
+        lengths, guess, lambda alpha: catenary_length(alpha, width),
+        lambda alpha: catenary_slope(alpha, width),
+    )
+
+
+def fit_parabola(lengths, width):
+    """Steepness a of the parabola 0.5*a*x^2 through the tops of two posts
+    width apart, with the given length between them. Takes a single length
+    or an array of them. Lengths must be more than width.
+    """
+    lengths = check_lengths(lengths, width)
+    # Same shallow limit as the catenary.
+    guess = np.sqrt(24*(lengths/width - 1))/width
+    return solve_increasing(
+        lengths, guess, lambda a: parabola_length(a, width),
+        lambda a: parabola_slope(a, width),
+    )
+
+
+def check_lengths(lengths, width):
+    # A chain no longer than the gap can't sag at all, and there's no
+    # steepness to find.
+    lengths = np.asarray(lengths, dtype=float)
+    if np.any(lengths <= width):
+        raise ValueError(
+            "Chain lengths must be more than the width, %g" % width
+        )
+    return lengths
+
+
+def catenary(x, alpha, width, top):
+    # Height of the fitted catenary at each x. Pass an array of alphas with a
+    # trailing axis, like alpha[:, np.newaxis], to get one row per fit.
+    return top + (np.cosh(alpha*x) - np.cosh(alpha*width/2))/alpha
+
+
+def parabola(x, a, width, top):
+    # Same deal as catenary().
+    return top + 0.5*a*(x**2 - (width/2)**2)
+
+
+def catenary_length(alpha, width):
+    return 2*np.sinh(alpha*width/2)/alpha
+
+
+def catenary_slope(alpha, width):
+    # Derivative of catenary_length() with respect to alpha.
+    return (width*np.cosh(alpha*width/2) - catenary_length(alpha, width))/alpha
+
+
+def parabola_length(a, width):
+    t = a*width/2
+    return (t*np.sqrt(1 + t**2) + np.arcsinh(t))/a
+
+
+def parabola_slope(a, width):
+    # Derivative of parabola_length() with respect to a.
+    return (parabola_length(a, width) - 2*np.arcsinh(a*width/2)/a)/a
+
+
+def solve_increasing(target, guess, func, slope):
+    # Solve func(x) = target for x > 0, for an increasing func. Start by
+    # growing a bracket out from the guess, then narrow it down.
+    target, guess = np.broadcast_arrays(target, guess)
+    shape = target.shape
+    target, x = target.ravel(), guess.astype(float).ravel()
+    lo = np.zeros_like(x)
+    hi = x.copy()
+    with np.errstate(over="ignore"):
+        short = func(hi) < target
+        while np.any(short):
+            lo[short] = hi[short]
+            hi[short] *= 2
+            short = func(hi) < target
+    # Only keep iterating on the entries that haven't converged yet.
+    todo = np.flatnonzero(np.isfinite(target))
+    last_step = hi - lo
+    for _ in range(MAX_ITERATIONS):
+        if len(todo) == 0:
+            break
+        old = x[todo]
+        f = func(old) - target[todo]
+        dfdx = slope(old)
+        lo[todo] = np.where(f < 0, old, lo[todo])
+        hi[todo] = np.where(f < 0, hi[todo], old)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            newton = old - f/dfdx
+            # Bisect instead if Newton leaves the bracket, or isn't at least
+            # halving the step.
+            use_newton = (
+                np.isfinite(newton) & (newton > lo[todo]) &
+                (newton < hi[todo]) &
+                (np.abs(2*f) <= np.abs(last_step[todo]*dfdx))
+            )
+        new = np.where(use_newton, newton, 0.5*(lo[todo] + hi[todo]))
+        x[todo] = new
+        last_step[todo] = new - old
+        done = np.abs(new - old) <= TOLERANCE*np.abs(new)
+        todo = todo[~done]
+    return x.reshape(shape) if shape else x[0]
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,13 @@ N_POINTS = 100
 WAVE_LENGTH = 2
 WAVE_HEIGHT = 3
 
+# The online interpreter can't use numpy, so by default we build the waves up
+# with plain lists. Running locally, set this to use spectral.py instead, which
+# keeps the standing waves in a matrix and handles much bigger N_POINTS and
+# N_TERMS. It also gets the weights of the standing waves from a fast sine
+# transform.
+USE_SPECTRAL = False
+
 
 def main():
     # Based on the initial conditions, figure out how much of each standing
@@ -36,9 +43,24 @@ def main():
     # We're solving for this motion using the wave equation, not forces. Time
     # step is just to make the animation look nice.
     t, dt, tmax = 0, 0.1, 20
+    x = xarr()
+    if USE_SPECTRAL:
+        # Imported here so the default runs without numpy.
+        import curves as bulk
+        import spectral
+        modes = spectral.mode_matrix(N_POINTS, max(N_TERMS), L)
+        omega = spectral.frequencies(max(N_TERMS), L, C)
+        # The grid never moves, so only the displacements change each frame.
+        updaters = [bulk.fixed_x_updater(curve, x) for curve in curves]
     while t < tmax:
         rate(1/dt)
         t += dt
+        if USE_SPECTRAL:
+            # All three partial sums at once.
+            sums = spectral.partial_sums(modes, alpha, beta, omega, t, N_TERMS)
+            for update, u in zip(updaters, sums):
+                update(u)
+            continue
         # Build up u(x, t) as a sum of eigenvectors
         u = [0]*N_POINTS
         for n in range(max(N_TERMS)):
@@ -56,20 +78,13 @@ def main():
             # terms. We want to see the difference between them.
 
             if n+1 == 3:
-                curves[0].delete()
-                for xi, ui in zip(xarr(), u):
-                    curves[0].plot(xi, ui)
+                redraw(curves[0], x, u)
 
             if n+1 == 10:
-                curves[1].delete()
-                for xi, ui in zip(xarr(), u):
-                    curves[1].plot(xi, ui)
-
+                redraw(curves[1], x, u)
 
             if n+1 == 20:
-                curves[2].delete()
-                for xi, ui in zip(xarr(), u):
-                    curves[2].plot(xi, ui)
+                redraw(curves[2], x, u)
 
     return
 
@@ -90,9 +105,28 @@ def get_curve(title):
     return gcurve(color=color.blue, width=2)
 
 
+def redraw(curve, x, u):
+    # Swap in the whole curve with one update, rather than deleting it and
+    # plotting it again one point at a time.
+    data = []
+    for xi, ui in zip(x, u):
+        data.append([xi, ui])
+    curve.data = data
+    return
+
+
 def get_fourier_weights():
     u0 = initial_displacement()
     v0 = initial_velocity()
+    if USE_SPECTRAL:
+        # Same weights as the loop below, from a fast sine transform.
+        import spectral
+        nterms = max(N_TERMS)
+        omega = spectral.frequencies(nterms, L, C)
+        alpha = spectral.sine_weights(u0, nterms)
+        beta = spectral.sine_weights(v0, nterms)/omega
+        return alpha, beta
+    # Reference version: integrate against each standing wave in turn.
     alpha, beta = [], []
     for n in range(max(N_TERMS)):
         # Alpha amplitudes correspond to the cosine wave in t, which is at
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+"""
+Lots of balls bouncing around a box and off of each other, for looking at
+kinetic theory. Positions and velocities live in (N, D) arrays.
+
+Checking every pair of balls for a collision costs O(N^2). Instead, the box
+is cut into cells at least one ball across, and each ball is only checked
+against the balls in its own cell and the cells touching it. At a fixed
+density that's O(N).
+
+Running this file directly times a step for more and more balls at the same
+density.
+"""
+
+import itertools
+import time
+
+import numpy as np
+
+
+# A dilute gas, or a ball that wanders far off, could call for far more cells
+# than balls. Past this many cells per ball, the cells get bigger instead.
+MAX_CELLS_PER_BALL = 4
+
+
+def main():
+    print("%8s %12s %12s" % ("balls", "ms/step", "us/ball"))
+    for nballs in (1000, 4000, 16000, 64000, 256000):
+        # Keep the density the same as the box grows.
+        size = np.sqrt(nballs)
+        lo, hi = np.array([0, 0]), np.array([size, size])
+        pos, vel = random_gas(nballs, 0.1, lo, hi, speed=1, seed=0)
+        nsteps = 20
+        start = time.perf_counter()
+        for _ in range(nsteps):
+            step(pos, vel, 1, 0.1, np.zeros(2), lo, hi, 0.01)
+        elapsed = time.perf_counter() - start
+        print("%8d %12.2f %12.3f" % (
+            nballs, 1000*elapsed/nsteps, 1e6*elapsed/nsteps/nballs
+        ))
+    return
+
+
+def random_gas(nballs, radius, lo, hi, speed, seed=None):
+    """Starting positions and velocities for nballs balls inside the box from
+    lo to hi. The balls start out on a jittered grid, so none of them overlap,
+    and head off in random directions at random speeds up to speed.
+    """
+    rng = np.random.default_rng(seed)
+    lo = np.asarray(lo, dtype=float)
+    hi = np.asarray(hi, dtype=float)
+    ndim = len(lo)
+    # Smallest grid with enough sites, then a random choice of sites.
+    per_side = int(np.ceil(nballs**(1/ndim)))
+    spacing = (hi - lo)/per_side
+    if np.any(spacing < 2*radius):
+        raise ValueError("Too many balls to fit in the box")
+    sites = np.stack(np.unravel_index(
+        rng.choice(per_side**ndim, nballs, replace=False), (per_side,)*ndim
+    ), axis=1)
+    jitter = rng.uniform(-0.5, 0.5, (nballs, ndim))*(spacing - 2*radius)
+    pos = lo + (sites + 0.5)*spacing + jitter
+    direction = rng.normal(size=(nballs, ndim))
+    direction /= np.linalg.norm(direction, axis=1)[:, np.newaxis]
+    vel = direction*rng.uniform(0, speed, (nballs, 1))
+    return pos, vel
+
+
+def step(pos, vel, mass, radius, gravity, lo, hi, dt):
+    # One step: move everything, bounce off the walls, then bounce balls off
+    # each other. Arrays are updated in place.
+    vel += gravity*dt
+    pos += vel*dt
+    bounce_walls(pos, vel, lo, hi)
+    i, j = find_pairs(pos, 2*radius)
+    collide(pos, vel, mass, i, j)
+    return pos, vel
+
+
+def bounce_walls(pos, vel, lo, hi):
+    # The box runs from lo to hi, for the centers of the balls. Any ball that
+    # got past a wall is reflected back in, and its velocity points inward.
+    # Use inf for a side with no wall.
+    below, above = pos < lo, pos > hi
+    pos[:] = np.where(below, 2*lo - pos, np.where(above, 2*hi - pos, pos))
+    vel[:] = np.where(
+        below, np.abs(vel), np.where(above, -np.abs(vel), vel)
+    )
+    return
+
+
+def find_pairs(pos, distance):
+    """Indices i and j of every pair of balls closer than distance, with each
+    pair listed once. Uses a cell list with cells at least distance across.
+    """
+    nballs, ndim = pos.shape
+    corner = pos.min(axis=0)
+    extent = pos.max(axis=0) - corner
+    max_per_side = np.ceil((MAX_CELLS_PER_BALL*nballs)**(1/ndim))
+    size = np.maximum(distance, extent/max_per_side)
+    shape = (extent//size + 1).astype(int)
+    cell = np.minimum(((pos - corner)//size).astype(int), shape - 1)
+    # Sort the balls by cell, so each cell's balls sit together.
+    cell_id = np.ravel_multi_index(cell.T, shape)
+    order = np.argsort(cell_id, kind="stable")
+    cell, cell_id = cell[order], cell_id[order]
+    ncells = np.prod(shape)
+    count = np.bincount(cell_id, minlength=ncells)
+    first = np.cumsum(count) - count
+    # Each pair of touching cells only needs to be checked once, so only look
+    # at half of the neighbors, plus the cell itself.
+    pairs_i, pairs_j = [], []
+    for offset in itertools.product((-1, 0, 1), repeat=ndim):
+        if offset < (0,)*ndim:
+            continue
+        neighbor = cell + offset
+        inside = np.all((neighbor >= 0) & (neighbor < shape), axis=1)
+        balls = np.flatnonzero(inside)
+        neighbor_id = np.ravel_multi_index(neighbor[balls].T, shape)
+        start = first[neighbor_id]
+        stop = start + count[neighbor_id]
+        # Walk through the neighbor cell one slot at a time, for every ball
+        # at once. The busiest cell decides how many slots there are.
+        for slot in range(count[neighbor_id].max(initial=0)):
+            other = start + slot
+            keep = other < stop
+            if offset == (0,)*ndim:
+                # Within a cell, only take each pair once.
+                keep &= other > balls
+            a, b = balls[keep], other[keep]
+            gap = pos[order[a]] - pos[order[b]]
+            close = np.einsum("ij,ij->i", gap, gap) < distance**2
+            pairs_i.append(order[a[close]])
+            pairs_j.append(order[b[close]])
+    if not pairs_i:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    return np.concatenate(pairs_i), np.concatenate(pairs_j)
+
+
+def collide(pos, vel, mass, i, j, max_rounds=10):
+    """Elastic collisions between balls i and j. Each pair trades momentum
+    along the line between their centers, if they're heading toward each
+    other. Pairs already moving apart are left alone. Mass can be a single
+    number or one per ball.
+    """
+    mass = np.broadcast_to(np.asarray(mass, dtype=float), (len(pos),))
+    normal = pos[j] - pos[i]
+    normal /= np.linalg.norm(normal, axis=1)[:, np.newaxis]
+    # A ball touching two others can't bounce off both at once and still
+    # conserve energy. Go in rounds instead. Each round only takes pairs whose
+    # balls aren't in any earlier pair still waiting, so every ball is in at
+    # most one collision per round.
+    for _ in range(max_rounds):
+        closing = np.einsum("ij,ij->i", vel[i] - vel[j], normal)
+        approaching = closing > 0
+        if not np.any(approaching):
+            break
+        i, j = i[approaching], j[approaching]
+        normal, closing = normal[approaching], closing[approaching]
+        rank = np.arange(len(i))
+        first = np.full(len(pos), len(i))
+        np.minimum.at(first, i, rank)
+        np.minimum.at(first, j, rank)
+        now = (first[i] == rank) & (first[j] == rank)
+        a, b = i[now], j[now]
+        impulse = 2*closing[now]/(1/mass[a] + 1/mass[b])
+        push = impulse[:, np.newaxis]*normal[now]
+        vel[a] -= push/mass[a, np.newaxis]
+        vel[b] += push/mass[b, np.newaxis]
+    return
+
+
+if __name__ == "__main__":
+    main()
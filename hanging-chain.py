@@ -3,6 +3,8 @@
 from math import *
 from vpython import *
 
+import time
+
 LINK_MASS = 1
 GRAVITY = 9.8
 
@@ -33,17 +35,66 @@ FRICTION = 0.05
 # For real time, use 1. For 10x speed fast-forwarding, use 10.
 SPEED = 10
 
+# Set this to relax the chain with the array code in chain.py rather than
+# link by link. The spheres only get moved every STEPS_PER_FRAME steps, which
+# makes long chains practical.
+USE_ARRAYS = False
+STEPS_PER_FRAME = 10
+
+# Set this to skip the relaxation entirely and solve for the resting shape
+# directly, using Newton's method in chain.py.
+SOLVE_DIRECTLY = False
+
+# Set this to stop relaxing once the chain has settled, rather than always
+# running to tmax. Settled means no link feels a net force of more than
+# SETTLED_FORCE times its own weight.
+STOP_WHEN_SETTLED = False
+SETTLED_FORCE = 1e-3
+
+# Set this to fit the catenary and parabola with fitting.py, which stops as
+# soon as it has the answer, and to draw each fit in one go.
+USE_FITTING = False
+
+# Sweep mode skips the drawing and solves for the resting shape at every
+# combination of chain length, spring count, and spring constant below. How
+# far each shape strays from a catenary gets saved to SWEEP_FILE. With
+# WARM_START, each solve starts from the shape and catenary steepness found at
+# the previous point, rather than from scratch.
+SWEEP = False
+SWEEP_CHAIN_LENGTHS = list(range(21, 61))
+SWEEP_N_SPRINGS = (20, 40, 80)
+SWEEP_SPRING_CONSTANTS = (1000, 10000, 100000)
+SWEEP_FILE = "hanging-chain-sweep.npz"
+WARM_START = True
+
 
 def main():
+    if SWEEP:
+        sweep(
+            SWEEP_CHAIN_LENGTHS, SWEEP_N_SPRINGS, SWEEP_SPRING_CONSTANTS,
+            SWEEP_FILE,
+        )
+        return
     draw_posts()
     links = get_chain()
-    relax_chain(links)
+    start = time.perf_counter()
+    if SOLVE_DIRECTLY:
+        positions = solve_chain(links)
+    elif USE_ARRAYS:
+        positions = relax_chain_arrays(links)
+    else:
+        relax_chain(links)
+    print("wall time:", time.perf_counter() - start, "s")
     init_graph()
-    plot_chain(links)
     # The springs will always end up a little bit stretched, which means the
     # chain will always be a little bit longer than we expected initially.
     # Figure out the actual length here.
-    length = get_length(links)
+    if SOLVE_DIRECTLY or USE_ARRAYS:
+        plot_chain_arrays(positions)
+        length = get_length_arrays(positions)
+    else:
+        plot_chain(links)
+        length = get_length(links)
     plot_catenary(length)
     plot_parabola(length)
     print("target length:", CHAIN_LENGTH)
@@ -84,9 +135,13 @@ def relax_chain(links):
     t = 0
     dt = 0.01
     tmax = 20
+    steps = 0
     while t < tmax:
         t += dt
         rate(SPEED/dt)
+        # Keep track of the biggest net force on any link, to tell when the
+        # chain has settled.
+        residual = 0
         # If we update positions as we go, the left neighbor will always be a
         # time step ahead of the right neighbor. Better to go through once and
         # figure out the forces, then go through again and update positions.
@@ -106,6 +161,7 @@ def relax_chain(links):
                 stretch = spring_axis.mag - SPRING_LENGTH_RELAX
                 f_spring = -SPRING_CONSTANT*stretch*spring_axis.hat
                 f_net += f_spring
+            residual = max(residual, f_net.mag/(links[i].mass*GRAVITY))
             links[i].velocity += f_net*dt/links[i].mass
             # If energy is conserved, this will oscillate forever. We want to
             # let it relax into its lowest energy state. So every time step,
@@ -114,12 +170,178 @@ def relax_chain(links):
             links[i].velocity = links[i].velocity*(1 - FRICTION)
             next_pos[i] = links[i].pos + links[i].velocity*dt
 #            links[i].pos += links[i].velocity*dt
+        # If nothing is being pushed around anymore, we're done. Leave the
+        # links where they are.
+        if STOP_WHEN_SETTLED and residual <= SETTLED_FORCE:
+            break
         # Go back through and apply all the new positions at once.
         for pos, link in zip(next_pos, links):
             link.pos = pos
+        steps += 1
+    print("relaxation steps:", steps)
+    print("residual force:", residual, "link weights")
+    return
+
+
+def relax_chain_arrays(links):
+    # Same relaxation as relax_chain(), but with the whole chain in arrays.
+    # Returns the final positions as an (N_LINKS, 3) array. Imported here so
+    # the default runs without numpy.
+    import numpy as np
+    import chain
+    pos = link_positions(links)
+    velocity = np.zeros_like(pos)
+    # A tolerance of zero never triggers, so the chain relaxes until tmax.
+    tol = SETTLED_FORCE if STOP_WHEN_SETTLED else 0
+    t = 0
+    dt = 0.01
+    tmax = 20
+    steps = 0
+    while t < tmax:
+        t += dt*STEPS_PER_FRAME
+        rate(SPEED/(dt*STEPS_PER_FRAME))
+        info = chain.settle(
+            pos, velocity, dt, STEPS_PER_FRAME, FRICTION, tol, **chain_params()
+        )
+        steps += info["iterations"]
+        # Only touch the spheres once per frame.
+        for p, link in zip(pos, links):
+            link.pos = vector(*p)
+        if info["iterations"] < STEPS_PER_FRAME:
+            break
+    print("relaxation steps:", steps)
+    print("residual force:", info["residual"], "link weights")
+    return pos
+
+
+def solve_chain(links):
+    # Start from a sagging guess rather than the straight line of links, so
+    # the springs start out stretched. Returns the resting positions as an
+    # (N_LINKS, 3) array.
+    import chain
+    guess = chain.sagged_chain(
+        N_LINKS, POST_LEFT, POST_RIGHT, POST_TOP, CHAIN_LENGTH
+    )
+    pos, info = chain.equilibrium(guess, **chain_params())
+    print("newton iterations:", info["iterations"])
+    print("residual force:", info["residual"], "link weights")
+    for p, link in zip(pos, links):
+        link.pos = vector(*p)
+    return pos
+
+
+def sweep(chain_lengths, spring_counts, spring_constants, filename):
+    # Neighboring parameter points have nearly the same shape, so walk the
+    # grid in an order that only ever takes small steps. Chain length goes
+    # back and forth rather than jumping from the end back to the start.
+    import numpy as np
+    import chain
+    points = []
+    for spring_constant in spring_constants:
+        for n_springs in spring_counts:
+            points += [
+                (chain_length, n_springs, spring_constant)
+                for chain_length in chain_lengths
+            ]
+            chain_lengths = chain_lengths[::-1]
+    results = np.empty((len(points), 6))
+    solved = []
+    alpha = None
+    iterations = 0
+    start = time.perf_counter()
+    for row, (chain_length, n_springs, spring_constant) in enumerate(points):
+        if WARM_START and solved:
+            guess = predict_chain(
+                solved, chain_length, n_springs, spring_constant
+            )
+        else:
+            guess = chain.sagged_chain(
+                n_springs + 1, POST_LEFT, POST_RIGHT, POST_TOP, chain_length
+            )
+        # A warm start is already close, so skip the soft springs.
+        pos, info = chain.equilibrium(
+            guess, spring_constant, chain_length/n_springs, LINK_MASS, GRAVITY,
+            soft_start=not (WARM_START and len(solved) > 0),
+        )
+        # Only the last two solutions are needed to predict the next one.
+        solved = solved[-1:] + [
+            (chain_length, n_springs, spring_constant, pos)
+        ]
+        iterations += info["iterations"]
+        length = chain.length(pos)
+        # The last alpha is already close. Start with a tight bracket around
+        # it, which bisection_search() widens if it has to.
+        if WARM_START and alpha is not None:
+            alpha = bisection_search(
+                length, catenary_length, guess=alpha, spread=1.1, tol=1e-12
+            )
+        else:
+            alpha = bisection_search(
+                length, catenary_length, guess=1/CHAIN_LENGTH, tol=1e-12
+            )
+        y0 = POST_TOP - cosh(alpha*POST_WIDTH/2)/alpha
+        catenary = np.cosh(alpha*pos[:, 0])/alpha + y0
+        results[row] = (
+            chain_length, n_springs, spring_constant, length, alpha,
+            np.max(np.abs(pos[:, 1] - catenary)),
+        )
+    elapsed = time.perf_counter() - start
+    print("parameter points:", len(points))
+    print("newton iterations:", iterations)
+    print("wall time:", elapsed, "s")
+    np.savez_compressed(
+        filename,
+        chain_length=results[:, 0],
+        n_springs=results[:, 1],
+        spring_constant=results[:, 2],
+        actual_length=results[:, 3],
+        alpha=results[:, 4],
+        catenary_deviation=results[:, 5],
+    )
     return
 
 
+def predict_chain(solved, chain_length, n_springs, spring_constant):
+    # Starting guess for the next sweep point, from the last one or two
+    # solved. If the last two differ only in chain length, draw a straight
+    # line through their shapes and follow it to the new length. Otherwise,
+    # just reuse the last shape.
+    same_chain = [
+        (n, k) == (n_springs, spring_constant) for _, n, k, _ in solved
+    ]
+    last_length, _, _, last_pos = solved[-1]
+    if len(solved) == 2 and all(same_chain):
+        first_length, _, _, first_pos = solved[0]
+        slope = (last_pos - first_pos)/(last_length - first_length)
+        return last_pos + slope*(chain_length - last_length)
+    return resample_chain(last_pos, n_springs + 1)
+
+
+def resample_chain(pos, nlinks):
+    # Spread nlinks links along the shape of an existing chain, keeping each
+    # at the same fraction of the way along.
+    import numpy as np
+    old = np.linspace(0, 1, len(pos))
+    new = np.linspace(0, 1, nlinks)
+    return np.stack([np.interp(new, old, pos[:, i]) for i in range(3)], axis=1)
+
+
+def chain_params():
+    # The physical constants chain.py needs, in one place.
+    return {
+        "spring_constant": SPRING_CONSTANT,
+        "relaxed_length": SPRING_LENGTH_RELAX,
+        "mass": LINK_MASS,
+        "gravity": GRAVITY,
+    }
+
+
+def link_positions(links):
+    # Pull the link positions out into an (N_LINKS, 3) array.
+    import numpy as np
+    return np.array([[link.pos.x, link.pos.y, link.pos.z] for link in links])
+
+
 def get_length(links):
     length = 0
     for i in range(N_LINKS):
@@ -131,6 +353,12 @@ def get_length(links):
     return length
 
 
+def get_length_arrays(positions):
+    # Same as get_length(), straight from an (N_LINKS, 3) array.
+    import chain
+    return chain.length(positions)
+
+
 def plot_chain(links):
     curve = gdots(color=color.black, width=1, label="Chain")
     for link in links:
@@ -138,14 +366,32 @@ def plot_chain(links):
     return
 
 
+def plot_chain_arrays(positions):
+    curve = gdots(color=color.black, width=1, label="Chain")
+    # All the points go in one call.
+    curve.plot(positions[:, :2].tolist())
+    return
+
+
 def plot_catenary(length):
     # There is no analytical way to go from chain length to alpha (the
     # steepness of the catenary) so we solve for it numerically. This can also
     # be done by hand, in Mathematica, etc.
-    alpha = bisection_search(length, catenary_length, guess=1/CHAIN_LENGTH)
-    y0 = POST_TOP - cosh(alpha*POST_WIDTH/2)/alpha
     curve = gcurve(color=color.blue, width=1, label="Catenary")
     npoints = 1000
+    if USE_FITTING:
+        # Imported here so the default runs without numpy.
+        import numpy as np
+        import curves
+        import fitting
+        alpha = fitting.fit_catenary(length, POST_WIDTH)
+        x = POST_LEFT + np.arange(npoints)*POST_WIDTH/npoints
+        curves.set_data(
+            curve, x, fitting.catenary(x, alpha, POST_WIDTH, POST_TOP)
+        )
+        return
+    alpha = bisection_search(length, catenary_length, guess=1/CHAIN_LENGTH)
+    y0 = POST_TOP - cosh(alpha*POST_WIDTH/2)/alpha
     for i in range(npoints):
         x = POST_LEFT + i*POST_WIDTH/npoints
         y = cosh(alpha*x)/alpha + y0
@@ -158,9 +404,17 @@ def plot_parabola(length):
     # parabola, so we solve for it numerically. This can also be done by hand,
     # in Mathematica, etc.
     curve = gcurve(color=color.red, width=1, label="Parabola")
+    npoints = 1000
+    if USE_FITTING:
+        import numpy as np
+        import curves
+        import fitting
+        a = fitting.fit_parabola(length, POST_WIDTH)
+        x = POST_LEFT + np.arange(npoints)*POST_WIDTH/npoints
+        curves.set_data(curve, x, fitting.parabola(x, a, POST_WIDTH, POST_TOP))
+        return
     a = bisection_search(length, parabola_length, guess=1/CHAIN_LENGTH)
     y0 = POST_TOP - 0.5*a*(POST_WIDTH/2)**2
-    npoints = 1000
     for i in range(npoints):
         x = POST_LEFT + i*POST_WIDTH/npoints
         y = 0.5*a*x**2 + y0
@@ -179,20 +433,48 @@ def parabola_length(a):
     return (t*sqrt(1 + t**2) + log(t + sqrt(1 + t**2)))/a
 
 
-def bisection_search(target, func, guess):
+def bisection_search(target, func, guess, spread=100, tol=None):
     # Finds x such that
     #    func(x) = target
     # Using a bisection search. This was not expected. It would also be fine to
     # figure out the solution by hand, use Mathematica, etc.
-    guess_min = 0.01*guess
-    guess_max = 100*guess
-    for _ in range(50):
+    # Every curve between the posts is longer than the gap between them.
+    if target <= POST_WIDTH:
+        raise ValueError(
+            "No curve of length %g fits between posts %g apart"
+            % (target, POST_WIDTH)
+        )
+    guess_min = guess/spread
+    guess_max = guess*spread
+    # A tight bracket around a good guess might miss. If so, widen it. This
+    # assumes func goes up with x, like the curve lengths do. A target just
+    # barely longer than the gap, or far longer, can still be out of reach in
+    # floating point, so only widen so many times.
+    bracketed = False
+    for _ in range(100):
+        try:
+            if func(guess_min) > target:
+                guess_min /= spread
+            elif func(guess_max) < target:
+                guess_max *= spread
+            else:
+                bracketed = True
+                break
+        except OverflowError:
+            break
+    if not bracketed:
+        raise ValueError("Can't bracket a curve of length %g" % target)
+    # With no tolerance, always take 50 steps. Otherwise stop once the bracket
+    # is that small compared to the answer.
+    for _ in range(50 if tol is None else 200):
         guess_med = 0.5*(guess_min + guess_max)
         target_med = func(guess_med)
         if target > target_med:
             guess_min = guess_med
         else:
             guess_max = guess_med
+        if tol is not None and guess_max - guess_min <= tol*guess_med:
+            break
     return guess_med
 
 
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+
+"""
+Exact two-body propagation around a fixed sun. Kepler's equation is solved in
+universal variables, which covers ellipses, parabolas, and hyperbolas with one
+formula. Bound orbits are first wound back by whole periods, so the cost of
+getting the state at time t doesn't grow with t.
+
+Everything works on arrays. Pass a stack of initial states and a matching
+array of times, or use propagate_grid() to get every planet at every time.
+
+Running this file directly cross-checks the propagator against a numerical
+integration, then times a batch of planets.
+"""
+
+import math
+import time
+
+import numpy as np
+
+import integrators
+
+
+# The universal Kepler equation is solved to this relative tolerance. The
+# iteration limit is only reached if Newton keeps falling back to bisection.
+TOLERANCE = 1e-13
+MAX_ITERATIONS = 100
+
+
+def main():
+    # Work in AU and years, where GM for the sun is 4 pi^2. Same launch setup
+    # as the planets in earth-orbit.py.
+    mu = 4*math.pi**2
+    angles = np.radians([0, 10, 20, 30, 40])
+    pos0 = np.zeros((len(angles), 3))
+    pos0[:, 1] = 1
+    vel0 = 2*math.pi*np.stack(
+        [np.ones_like(angles), np.tan(angles), np.zeros_like(angles)], axis=1
+    )
+    # Cross-check against the numerical loop, at the step size the scripts
+    # use and with a much finer fourth-order integration.
+    tmax = 10
+    exact, _ = propagate(pos0, vel0, tmax, mu)
+    print("Position error after %d years, in AU:" % tmax)
+    print("%8s %14s %14s" % ("angle", "euler dt=1e-3", "yoshida dt=1e-4"))
+    for i, angle in enumerate(np.degrees(angles)):
+        errors = []
+        for name, dt in (("euler", 1e-3), ("yoshida4", 1e-4)):
+            pos = integrate(pos0[i], vel0[i], mu, name, dt, tmax)
+            errors.append(np.linalg.norm(pos - exact[i]))
+        print("%8.0f %14.2e %14.2e" % (angle, errors[0], errors[1]))
+    # Batched: thousands of planets, each sampled many times.
+    nplanets, ntimes = 2000, 1000
+    angles = np.linspace(0, 44, nplanets)*math.pi/180
+    pos0 = np.zeros((nplanets, 3))
+    pos0[:, 1] = 1
+    vel0 = 2*math.pi*np.stack(
+        [np.ones_like(angles), np.tan(angles), np.zeros_like(angles)], axis=1
+    )
+    times = np.linspace(0, 100, ntimes)
+    start = time.perf_counter()
+    propagate_grid(pos0, vel0, times, mu)
+    elapsed = time.perf_counter() - start
+    print(
+        "%d planets at %d times: %.2f s (%.0f states per second)"
+        % (nplanets, ntimes, elapsed, nplanets*ntimes/elapsed)
+    )
+    return
+
+
+def integrate(pos, vel, mu, name, dt, tmax):
+    # The numerical loop, for comparison.
+    step = integrators.get_integrator(name)
+
+    def accel(pos):
+        return -mu*pos/np.sqrt(np.sum(pos*pos))**3
+
+    for _ in range(int(round(tmax/dt))):
+        pos, vel = step(pos, vel, accel, dt)
+    return pos
+
+
+def propagate_grid(pos0, vel0, times, mu):
+    # Every planet at every time. With n planets and m times, pos0 and vel0
+    # are (n, 3) and the results are (m, n, 3).
+    times = np.asarray(times, dtype=float)
+    return propagate(
+        np.asarray(pos0)[np.newaxis], np.asarray(vel0)[np.newaxis],
+        times[:, np.newaxis], mu,
+    )
+
+
+def propagate(pos0, vel0, t, mu):
+    """Position and velocity at time t, starting from pos0 and vel0 at t=0,
+    relative to a fixed body with gravitational parameter mu = G*M. The last
+    axis of pos0 and vel0 holds x, y, z. Everything else broadcasts against t.
+    """
+    pos0 = np.asarray(pos0, dtype=float)
+    vel0 = np.asarray(vel0, dtype=float)
+    t = np.asarray(t, dtype=float)
+    r0 = np.linalg.norm(pos0, axis=-1)
+    v0_sq = np.sum(vel0*vel0, axis=-1)
+    # Radial velocity and inverse semi-major axis. Alpha is positive for bound
+    # orbits, zero for parabolas, and negative for escapes.
+    vr0 = np.sum(pos0*vel0, axis=-1)/r0
+    alpha = 2/r0 - v0_sq/mu
+    sqrt_mu = math.sqrt(mu)
+    # Bound orbits repeat, so only the time since the last full period
+    # matters.
+    bound = alpha > 0
+    period = np.where(bound, 2*np.pi/np.sqrt(mu*np.abs(alpha)**3), np.inf)
+    t = np.where(bound, np.fmod(t, period), t)
+    t, r0, vr0, alpha = np.broadcast_arrays(t, r0, vr0, alpha)
+    # Perihelion distance, from the angular momentum and eccentricity.
+    h_sq = np.sum(np.cross(pos0, vel0)**2, axis=-1)
+    ecc = np.sqrt(np.maximum(0, 1 - alpha*h_sq/mu))
+    perihelion = np.broadcast_to(h_sq/(mu*(1 + ecc)), t.shape)
+    chi = solve_universal(t, r0, vr0, alpha, perihelion, sqrt_mu)
+    # Lagrange coefficients map the initial state to the final one.
+    z = alpha*chi**2
+    c, s = stumpff_c(z), stumpff_s(z)
+    f = 1 - chi**2/r0*c
+    g = t - chi**3*s/sqrt_mu
+    pos = f[..., np.newaxis]*pos0 + g[..., np.newaxis]*vel0
+    r = np.linalg.norm(pos, axis=-1)
+    fdot = sqrt_mu/(r*r0)*(z*chi*s - chi)
+    gdot = 1 - chi**2/r*c
+    vel = fdot[..., np.newaxis]*pos0 + gdot[..., np.newaxis]*vel0
+    return pos, vel
+
+
+def solve_universal(t, r0, vr0, alpha, perihelion, sqrt_mu):
+    # Solve the universal Kepler equation F(chi) = 0 for chi. dF/dchi is the
+    # distance from the sun, which is never less than the perihelion distance,
+    # so F only ever goes up. That gives a bracket around the root. Take
+    # Newton steps when they stay inside the bracket, and bisect when they
+    # don't.
+    limit = sqrt_mu*np.abs(t)/perihelion
+    # A bound orbit sweeps through 2 pi/sqrt(alpha) of chi in one period.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        period_chi = 2*np.pi/np.sqrt(alpha)
+    limit = np.where(alpha > 0, np.minimum(limit, period_chi), limit)
+    lo = np.where(t < 0, -limit, 0)
+    hi = np.where(t < 0, 0, limit)
+    chi = np.clip(initial_guess(t, r0, vr0, alpha, sqrt_mu), lo, hi)
+    # Only keep iterating on the entries that haven't converged yet.
+    todo = np.flatnonzero(np.ones(t.shape, dtype=bool))
+    flat = [x.ravel() for x in (chi, lo, hi, t, r0, vr0, alpha)]
+    chi, lo, hi, t_, r0_, vr0_, alpha_ = [x.copy() for x in flat]
+    last_step = hi - lo
+    for _ in range(MAX_ITERATIONS):
+        x, a, r, vr = chi[todo], alpha_[todo], r0_[todo], vr0_[todo]
+        z = a*x**2
+        c, s = stumpff_c(z), stumpff_s(z)
+        with np.errstate(over="ignore", invalid="ignore"):
+            f = r*vr/sqrt_mu*x**2*c + (1 - a*r)*x**3*s + r*x - sqrt_mu*t_[todo]
+            dfdchi = r*vr/sqrt_mu*x*(1 - z*s) + (1 - a*r)*x**2*c + r
+            newton = x - f/dfdchi
+        # Overflow only happens far out along chi, where F has the same sign
+        # as chi. Bisect back from there.
+        finite = np.isfinite(newton)
+        f = np.where(finite, f, np.sign(x))
+        lo[todo] = np.where(f < 0, x, lo[todo])
+        hi[todo] = np.where(f < 0, hi[todo], x)
+        # Newton also gets passed over if it isn't at least halving the step,
+        # which happens far out on the exponential tail of a hyperbola.
+        use_newton = finite & (newton >= lo[todo]) & (newton <= hi[todo])
+        with np.errstate(invalid="ignore"):
+            use_newton &= np.abs(2*f) <= np.abs(last_step[todo]*dfdchi)
+        new = np.where(use_newton, newton, 0.5*(lo[todo] + hi[todo]))
+        chi[todo] = new
+        last_step[todo] = new - x
+        done = np.abs(new - x) <= TOLERANCE*(np.abs(new) + 1)
+        todo = todo[~done]
+        if len(todo) == 0:
+            break
+    return chi.reshape(t.shape)
+
+
+def initial_guess(t, r0, vr0, alpha, sqrt_mu):
+    # Starting points for chi, from Vallado's Fundamentals of Astrodynamics.
+    # The elliptic guess is exact for circular orbits. The hyperbolic one
+    # comes from the asymptotic growth of the orbit.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        semi_major = 1/alpha
+        sign = np.where(t < 0, -1, 1)
+        hyperbolic = sign*np.sqrt(-semi_major)*np.log(
+            -2*sqrt_mu**2*alpha*t /
+            (r0*vr0 + sign*np.sqrt(-sqrt_mu**2*semi_major)*(1 - r0*alpha))
+        )
+    guess = np.where(alpha > 0, sqrt_mu*alpha*t, hyperbolic)
+    return np.where(np.isfinite(guess), guess, sqrt_mu*t/r0)
+
+
+def stumpff_c(z):
+    # C(z) = (1 - cos(sqrt(z)))/z, continued smoothly through zero to the
+    # hyperbolic branch. Near zero the closed form loses precision, so use
+    # the series instead.
+    z = np.asarray(z, dtype=float)
+    small = np.abs(z) < 1e-3
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        root = np.sqrt(np.abs(z))
+        closed = np.where(
+            z > 0, (1 - np.cos(root))/z, (np.cosh(root) - 1)/-z
+        )
+    series = 1/2 - z/24 + z**2/720 - z**3/40320
+    return np.where(small, series, closed)
+
+
+def stumpff_s(z):
+    # S(z) = (sqrt(z) - sin(sqrt(z)))/z^(3/2), same deal as stumpff_c.
+    z = np.asarray(z, dtype=float)
+    small = np.abs(z) < 1e-3
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        root = np.sqrt(np.abs(z))
+        closed = np.where(
+            z > 0,
+            (root - np.sin(root))/root**3,
+            (np.sinh(root) - root)/root**3,
+        )
+    series = 1/6 - z/120 + z**2/5040 - z**3/362880
+    return np.where(small, series, closed)
+
+
+if __name__ == "__main__":
+    main()
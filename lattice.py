@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+"""
+Array-backed version of three-springs.py for long lines of blocks. Block i
+sits between spring i-1 and spring i. With fixed ends there are walls past
+the first and last blocks, and one more spring than blocks. With periodic
+ends the line wraps around, and the last spring joins the last block back to
+the first.
+
+Each block only feels its neighbors, so the stiffness matrix is banded.
+Rather than build it, forces() applies it directly with shifted arrays. That
+keeps a step at O(N) with nothing bigger than a few arrays of length N.
+
+Displacement snapshots stream straight to a .npy file as the run goes, so a
+long run never has to fit in memory.
+
+Running this file directly checks the stepping against the exact normal-mode
+answer, then times steps for up to 10^6 blocks.
+"""
+
+import time
+
+import numpy as np
+
+import normal_modes
+
+
+def main():
+    # Small lattice with uneven springs and masses, against the exact answer.
+    rng = np.random.default_rng(0)
+    nblocks = 50
+    masses = rng.uniform(0.5, 2, nblocks)
+    spring_constants = rng.uniform(0.5, 2, nblocks + 1)
+    x0 = pulse(nblocks, center=10, width=3)
+    v0 = np.zeros(nblocks)
+    x, v = x0.copy(), v0.copy()
+    dt, nsteps = 0.001, 20000
+    advance(x, v, masses, spring_constants, dt, nsteps)
+    exact, _ = normal_modes.solver(masses, spring_constants, x0, v0)(nsteps*dt)
+    error = np.max(np.abs(x - exact))
+    print("worst error after %d steps: %.2e" % (nsteps, error))
+    print("%10s %10s %12s" % ("blocks", "ends", "ms/step"))
+    for nblocks in (10**4, 10**5, 10**6):
+        for periodic in (False, True):
+            x = pulse(nblocks, center=nblocks//2, width=100)
+            v = np.zeros(nblocks)
+            nsteps = 50
+            start = time.perf_counter()
+            advance(x, v, 1, 1, 0.1, nsteps, periodic)
+            elapsed = time.perf_counter() - start
+            print("%10d %10s %12.3f" % (
+                nblocks, "periodic" if periodic else "fixed",
+                1000*elapsed/nsteps,
+            ))
+    return
+
+
+def pulse(nblocks, center, width):
+    # A Gaussian bump of displacement, to send waves out in both directions.
+    return np.exp(-0.5*((np.arange(nblocks) - center)/width)**2)
+
+
+def forces(x, spring_constants, periodic=False):
+    """Net spring force on each block, from the displacements x. Spring
+    constants can be a single number or one per spring.
+    """
+    if periodic:
+        tension = spring_constants*(np.roll(x, -1) - x)
+        return tension - np.roll(tension, 1)
+    # Walls don't move, so pad the ends with zero displacement.
+    stretch = np.diff(x, prepend=0, append=0)
+    tension = spring_constants*stretch
+    return tension[1:] - tension[:-1]
+
+
+def advance(x, v, masses, spring_constants, dt, nsteps, periodic=False):
+    # Same update as three-springs.py: momentum first, then position. Arrays
+    # are updated in place.
+    for _ in range(nsteps):
+        v += forces(x, spring_constants, periodic)*dt/masses
+        x += v*dt
+    return x, v
+
+
+def record(filename, x, v, masses, spring_constants, dt, nsteps, every,
+           periodic=False):
+    """Run for nsteps, saving the displacements every few steps to a .npy
+    file as rows of single precision. Row i is the state at time
+    (i + 1)*every*dt. Only one row is ever held in memory. Returns the final
+    x and v, which are also updated in place.
+    """
+    nrows = nsteps//every
+    snapshots = np.lib.format.open_memmap(
+        filename, mode="w+", dtype=np.float32, shape=(nrows, len(x))
+    )
+    for row in range(nrows):
+        advance(x, v, masses, spring_constants, dt, every, periodic)
+        snapshots[row] = x
+    snapshots.flush()
+    del snapshots
+    advance(x, v, masses, spring_constants, dt, nsteps - nrows*every, periodic)
+    return x, v
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+"""
+Wires and coils as one vpython object each. Drawing a wire as a chain of
+short cylinders makes one object per link, and every object costs something
+to set up and something more on every frame. A curve through all the points
+is a single object, however many points there are. The points come from
+array math up front rather than a loop that makes objects as it goes.
+
+A curve can't take a texture, so a textured wire is a circle swept along
+the points instead, with vpython's extrusion. That's still one object.
+
+Points can also be cached on disk. Each set of points is saved the first
+time it's built, under a name made from a hash of the function that built
+it and everything that was passed in. After that it's loaded straight from
+disk, memory mapped, so only the parts that get used are ever read. The
+points go in .npy files rather than .npz, since numpy can only memory map
+the former.
+
+Running this file directly builds the brachistochrone wire and the solenoid
+coil both ways, and counts and times them. Then it times building a big coil
+against loading it from the cache.
+"""
+
+import hashlib
+import json
+import math
+import os
+import tempfile
+import time
+
+import numpy as np
+import vpython
+
+
+# Where cached points go, relative to wherever the script is run from.
+CACHE_DIR = "geometry-cache"
+
+
+def main():
+    # Same wire and coil as the scripts.
+    wire = cycloid(100, 500)
+    coil = helix(1, 10, 20, 5*math.pi/180)
+    print("%-16s %10s %14s" % ("", "objects", "build (ms)"))
+    for name, points, radius in (("wire", wire, 2), ("coil", coil, 0.05)):
+        start = time.perf_counter()
+        links = cylinders(points, radius, texture=vpython.textures.metal)
+        elapsed = time.perf_counter() - start
+        print("%-16s %10d %14.1f" % (
+            name + " links", len(links), 1000*elapsed
+        ))
+        for link in links:
+            link.visible = False
+        for texture in (None, vpython.textures.metal):
+            start = time.perf_counter()
+            tube(points, radius, texture=texture)
+            elapsed = time.perf_counter() - start
+            print("%-16s %10d %14.1f" % (
+                name + (" tube" if texture is None else " extrusion"), 1,
+                1000*elapsed,
+            ))
+    with tempfile.TemporaryDirectory() as directory:
+        params = {"radius": 1, "length": 10, "loops": 2000,
+                  "step": 0.1*math.pi/180}
+        start = time.perf_counter()
+        points = helix(**params)
+        elapsed = time.perf_counter() - start
+        print("%d points: %.1f ms to build" % (len(points), 1000*elapsed))
+        for label in ("first run, saving", "after that, loading"):
+            start = time.perf_counter()
+            cached(helix, params, directory)
+            elapsed = time.perf_counter() - start
+            print("%d points: %.1f ms %s" % (
+                len(points), 1000*elapsed, label
+            ))
+    return
+
+
+def cached(build, params, directory=CACHE_DIR):
+    """Same as build(**params), but saved to directory the first time, and
+    loaded memory mapped from there after that. The file name comes from
+    the name of build and the params, so anything that changes the points
+    changes the name. Change build itself, and the cache needs clearing.
+    """
+    key = json.dumps([build.__module__, build.__qualname__, params],
+                     sort_keys=True)
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+    path = os.path.join(directory, "%s-%s.npy" % (build.__name__, digest))
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        # Write somewhere else first, then move it into place, so a run
+        # that gets cut off never leaves half a file behind.
+        handle, scratch = tempfile.mkstemp(dir=directory, suffix=".npy")
+        try:
+            with os.fdopen(handle, "wb") as scratch_file:
+                np.save(scratch_file, build(**params))
+            # The scratch file starts out readable only by its owner, and
+            # moving it keeps that. Open it up like any other file.
+            os.chmod(scratch, 0o644)
+            os.replace(scratch, path)
+        finally:
+            # If anything above failed, don't leave the scratch file lying
+            # around. If it worked, the scratch file is already gone.
+            if os.path.exists(scratch):
+                os.unlink(scratch)
+    return np.load(path, mmap_mode="r")
+
+
+def helix(radius, length, loops, step):
+    # Points around a coil along the x axis, centered on the origin, every
+    # step radians. Same as the loop in solenoid.py.
+    theta = np.arange(0, loops*2*math.pi + step/2, step)
+    return np.column_stack((
+        length*(theta/(loops*2*math.pi) - 0.5),
+        radius*np.sin(theta),
+        radius*np.cos(theta),
+    ))
+
+
+def cycloid(radius, nsegments):
+    # Points along the brachistochrone wire, all the way around the wheel,
+    # centered on x = 0. Same as wire_x() and wire_y() in the scripts.
+    theta = np.linspace(0, 2*math.pi, nsegments + 1)
+    return np.column_stack((
+        radius*(theta - np.sin(theta)) - math.pi*radius,
+        radius*np.cos(theta),
+        np.zeros_like(theta),
+    ))
+
+
+def vectors(points):
+    # Rows of x, y, and z as vpython vectors.
+    return [vpython.vector(x, y, z) for x, y, z in np.asarray(points)]
+
+
+def tube(points, radius, texture=None, **options):
+    """One vpython object for a wire through an (N, 3) array of points. Any
+    other keywords, like color, go straight to vpython.
+    """
+    path = vectors(points)
+    if texture is None:
+        return vpython.curve(pos=path, radius=radius, **options)
+    return vpython.extrusion(
+        path=path, shape=vpython.shapes.circle(radius=radius),
+        texture=texture, **options
+    )
+
+
+def cylinders(points, radius, **options):
+    # The old way, one cylinder between each pair of points, for comparison.
+    path = vectors(points)
+    return [
+        vpython.cylinder(pos=tail, axis=head - tail, radius=radius, **options)
+        for tail, head in zip(path[:-1], path[1:])
+    ]
+
+
+if __name__ == "__main__":
+    main()
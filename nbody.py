@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+"""
+Headless N-body engine. Positions, velocities, and masses live in contiguous
+NumPy arrays, and all pairwise gravity is computed in one vectorized pass. The
+VPython objects are only touched when a frame is actually drawn.
+
+Running this file directly times the Sun-Earth setup from orbit.py, plus a
+larger random cluster, without any rendering.
+"""
+
+import time
+
+import numpy as np
+
+import integrators
+
+
+# Same SI values as orbit.py. This module never imports vpython, so it can run
+# without opening a browser window.
+AU = 1.496e11
+M_SUN = 1.988e30
+M_EARTH = 5.97e24
+SECOND = 1
+DAY = 86400
+YEAR = 365*DAY
+G = 6.674e-11
+
+V_EARTH = 2*np.pi*AU/YEAR
+
+
+def main():
+    # Sun-Earth setup from orbit.py: five years at one day per step.
+    pos, vel, mass = sun_earth_state()
+    nsteps = int(5*YEAR/DAY)
+    start = time.perf_counter()
+    advance(pos, vel, mass, dt=1*DAY, nsteps=nsteps)
+    elapsed = time.perf_counter() - start
+    print("sun-earth: %d steps in %.3f s" % (nsteps, elapsed))
+    # A bigger system to show off the vectorized force pass.
+    for n in (10, 100, 1000):
+        pos, vel, mass = cluster_state(n)
+        nsteps = 100
+        start = time.perf_counter()
+        advance(pos, vel, mass, dt=1*DAY, nsteps=nsteps, softening=0.01*AU)
+        elapsed = time.perf_counter() - start
+        print("n=%d: %d steps in %.3f s" % (n, nsteps, elapsed))
+    return
+
+
+def sun_earth_state():
+    # Same initial conditions as orbit.init_bodies(), minus the spheres.
+    pos = np.array([[0, 0, 0], [1*AU, 0, 0]], dtype=float)
+    vel = np.array([[0, 0, 0], [0, 0.8*V_EARTH, 0]], dtype=float)
+    mass = np.array([1*M_SUN, 1*M_EARTH], dtype=float)
+    return pos, vel, mass
+
+
+def cluster_state(n, radius=1*AU, total_mass=1*M_SUN, seed=0):
+    # Uniform sphere of equal-mass bodies, initially at rest.
+    rng = np.random.default_rng(seed)
+    direction = rng.normal(size=(n, 3))
+    direction /= np.linalg.norm(direction, axis=1)[:, np.newaxis]
+    pos = radius*np.cbrt(rng.random(n))[:, np.newaxis]*direction
+    vel = np.zeros((n, 3))
+    mass = np.full(n, total_mass/n)
+    return pos, vel, mass
+
+
+def get_state(bodies):
+    # Copy the physics out of the sphere objects and into arrays. Each body
+    # needs pos, v, and mass attributes, like the ones in orbit.py.
+    pos = np.array([[b.pos.x, b.pos.y, b.pos.z] for b in bodies], dtype=float)
+    vel = np.array([[b.v.x, b.v.y, b.v.z] for b in bodies], dtype=float)
+    mass = np.array([b.mass for b in bodies], dtype=float)
+    return pos, vel, mass
+
+
+def accelerations(pos, mass, g=G, softening=0):
+    # Separation from body i to body j is sep[i, j] = pos[j] - pos[i]. The
+    # acceleration of body i is the sum over j of G*m_j*sep/|sep|^3.
+    sep = pos[np.newaxis, :, :] - pos[:, np.newaxis, :]
+    dist2 = np.einsum("ijk,ijk->ij", sep, sep) + softening**2
+    # A body doesn't pull on itself. Infinite distance zeroes out the diagonal.
+    np.fill_diagonal(dist2, np.inf)
+    weight = mass[np.newaxis, :]*dist2**-1.5
+    return g*np.einsum("ij,ijk->ik", weight, sep)
+
+
+def advance(pos, vel, mass, dt, nsteps=1, g=G, softening=0, accel=None,
+            step=None):
+    # Arrays are updated in place. By default this is semi-implicit Euler, same
+    # as the loop in orbit.py, but any integrator from integrators.py can be
+    # passed as step. For big systems, pass barnes_hut.accelerations as the
+    # accel function.
+    if accel is None:
+        accel = accelerations
+    if step is None:
+        step = integrators.euler
+
+    def field(pos):
+        return accel(pos, mass, g, softening)
+
+    for _ in range(nsteps):
+        pos[...], vel[...] = step(pos, vel, field, dt)
+    return pos, vel
+
+
+def energy(pos, vel, mass, g=G, softening=0):
+    # Returns (potential, kinetic) energy of the whole system. Any leading axes
+    # on pos and vel, like time for a recorded run, carry through to the
+    # results.
+    kinetic = 0.5*np.sum(mass*np.sum(vel*vel, axis=-1), axis=-1)
+    sep = pos[..., np.newaxis, :, :] - pos[..., :, np.newaxis, :]
+    dist = np.sqrt(np.sum(sep*sep, axis=-1) + softening**2)
+    # Each pair shows up twice, once above and once below the diagonal.
+    i, j = np.triu_indices(len(mass), k=1)
+    potential = -g*np.sum(mass[i]*mass[j]/dist[..., i, j], axis=-1)
+    return potential, kinetic
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+"""
+Exact motion of masses in a line, joined by springs, with walls at both ends.
+The system is linear, so it splits into normal modes that each oscillate at
+their own frequency. Find them once and the state at any time is a sum of
+sines and cosines. No stepping, no integration error, and any time can be
+looked up directly.
+
+Running this file directly checks the Euler loop from three-springs.py
+against the exact answer and times both.
+"""
+
+import time
+
+import numpy as np
+
+
+def main():
+    masses = [1, 1]
+    spring_constants = [1, 1, 1]
+    x0 = [2, 2]
+    v0 = [0, 0]
+    state = solver(masses, spring_constants, x0, v0)
+    dt, tmax = 0.01, 100
+    times = np.arange(1, int(round(tmax/dt)) + 1)*dt
+    # Same update as three-springs.py: momentum first, then position.
+    start = time.perf_counter()
+    stiffness = stiffness_matrix(spring_constants)
+    x = np.array(x0, dtype=float)
+    v = np.array(v0, dtype=float)
+    euler = np.empty((len(times), len(x)))
+    for i in range(len(times)):
+        v -= stiffness @ x*dt/masses
+        x += v*dt
+        euler[i] = x
+    elapsed_euler = time.perf_counter() - start
+    start = time.perf_counter()
+    exact, _ = state(times)
+    elapsed_exact = time.perf_counter() - start
+    print("%d steps: %.3f s stepping, %.4f s exact" % (
+        len(times), elapsed_euler, elapsed_exact
+    ))
+    print("worst error from stepping: %.2e" % np.max(np.abs(euler - exact)))
+    start = time.perf_counter()
+    state(np.random.default_rng(0).uniform(0, 10**6, 10**6))
+    elapsed = time.perf_counter() - start
+    print("10^6 random times up to 10^6 s: %.3f s" % elapsed)
+    return
+
+
+def stiffness_matrix(spring_constants):
+    # Spring i runs from block i-1 to block i, counting the left wall as
+    # block -1 and the right wall as block n. Walls don't move, so they drop
+    # out and leave a tridiagonal matrix.
+    k = np.asarray(spring_constants, dtype=float)
+    return np.diag(k[:-1] + k[1:]) - np.diag(k[1:-1], 1) - np.diag(k[1:-1], -1)
+
+
+def normal_modes(masses, spring_constants):
+    """Angular frequencies and mode shapes for the blocks. Column j of the
+    shapes is mode j, scaled so that shape.T @ M @ shape is the identity.
+    """
+    m = np.asarray(masses, dtype=float)
+    # Solve K x = omega^2 M x by symmetrizing with the square root of M.
+    scale = 1/np.sqrt(m)
+    omega_sq, vectors = np.linalg.eigh(
+        scale[:, np.newaxis]*stiffness_matrix(spring_constants)*scale
+    )
+    return np.sqrt(np.maximum(omega_sq, 0)), scale[:, np.newaxis]*vectors
+
+
+def solver(masses, spring_constants, x0, v0):
+    """Returns a function that gives the displacements and velocities at time
+    t, starting from x0 and v0 at t = 0. Pass it an array of times to get one
+    row per time.
+    """
+    omega, shapes = normal_modes(masses, spring_constants)
+    m = np.asarray(masses, dtype=float)
+    # Amplitude of each mode at the start.
+    a0 = shapes.T @ (m*np.asarray(x0, dtype=float))
+    b0 = shapes.T @ (m*np.asarray(v0, dtype=float))
+
+    def state(t):
+        t = np.asarray(t, dtype=float)[..., np.newaxis]
+        cos, sin = np.cos(omega*t), np.sin(omega*t)
+        # sin(omega t)/omega, which is just t for a mode that doesn't swing.
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sin_over_omega = np.where(omega > 0, sin/omega, t)
+        displacement = (a0*cos + b0*sin_over_omega) @ shapes.T
+        velocity = (-a0*omega*sin + b0*cos) @ shapes.T
+        return displacement, velocity
+
+    return state
+
+
+if __name__ == "__main__":
+    main()
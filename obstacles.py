@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+
+"""
+Balls bouncing off a scene full of fixed vpython boxes and cylinders: walls,
+pegs, ramps, whatever. Each obstacle is turned into arrays once, and a
+bounding volume hierarchy (BVH) is built over them. That's a tree of
+axis-aligned boxes, each one wrapping its children, with a handful of
+obstacles in each leaf. A ball only has to look down the branches its own
+bounding box touches, so it only ever gets checked against nearby obstacles.
+
+Like the tree in barnes_hut.py, the BVH is a dict of arrays rather than a
+Python object per node. Every node's obstacles are a contiguous slice of the
+sorted obstacle order, and the tree is walked for all balls at once.
+
+Running this file directly times queries against checking every obstacle.
+"""
+
+import time
+
+import numpy as np
+
+
+# Nodes with this many obstacles or fewer don't get split any further.
+LEAF_SIZE = 4
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print("%10s %8s %12s %12s" % (
+        "obstacles", "balls", "bvh (ms)", "all (ms)"
+    ))
+    for nobstacles in (100, 1000, 10000):
+        # Random pegs pointing along z, scattered over a square.
+        size = np.sqrt(nobstacles)
+        base = np.zeros((nobstacles, 3))
+        base[:, :2] = rng.uniform(0, size, (nobstacles, 2))
+        base[:, 2] = -0.5
+        scene = tubes(
+            base, np.tile([0, 0, 1.0], (nobstacles, 1)), np.ones(nobstacles),
+            np.full(nobstacles, 0.2),
+        )
+        tree = build_bvh(scene)
+        nballs = 10000
+        pos = np.zeros((nballs, 3))
+        pos[:, :2] = rng.uniform(0, size, (nballs, 2))
+        start = time.perf_counter()
+        ball, obstacle = query(tree, pos, 0.1)
+        elapsed = time.perf_counter() - start
+        # The same contacts by checking every ball against every obstacle,
+        # for as many balls as fit in memory.
+        nbrute = min(nballs, 10**7//nobstacles)
+        start = time.perf_counter()
+        every = np.repeat(np.arange(nbrute), nobstacles)
+        depth, _ = contacts(scene, pos[every], 0.1, np.tile(
+            np.arange(nobstacles), nbrute
+        ))
+        elapsed_all = (time.perf_counter() - start)*nballs/nbrute
+        print("%10d %8d %12.2f %12.2f" % (
+            nobstacles, nballs, 1000*elapsed, 1000*elapsed_all
+        ))
+    return
+
+
+def from_vpython(boxes=(), cylinders=()):
+    """Arrays describing lists of vpython boxes and cylinders, for
+    build_bvh().
+    """
+    box_arrays = oriented_boxes(
+        [vec(b.pos) for b in boxes], [vec(b.axis) for b in boxes],
+        [vec(b.up) for b in boxes], [vec(b.size) for b in boxes],
+    )
+    tube_arrays = tubes(
+        [vec(c.pos) for c in cylinders],
+        [vec(c.axis.hat) for c in cylinders],
+        [c.axis.mag for c in cylinders],
+        [c.radius for c in cylinders],
+    )
+    return merge(box_arrays, tube_arrays)
+
+
+def vec(v):
+    return [v.x, v.y, v.z]
+
+
+def oriented_boxes(center, axis, up, size):
+    # A box is a center, three perpendicular unit vectors along its length,
+    # height, and width, and half of each of those.
+    center = np.asarray(center, dtype=float).reshape(-1, 3)
+    x = np.asarray(axis, dtype=float).reshape(-1, 3)
+    x = x/np.linalg.norm(x, axis=1)[:, np.newaxis]
+    # Same as vpython: up gets straightened out to be perpendicular to axis.
+    y = np.asarray(up, dtype=float).reshape(-1, 3)
+    # If they line up, vpython picks some other up. Any will do.
+    parallel = np.linalg.norm(np.cross(x, y), axis=1) < 1e-9
+    y[parallel] = np.eye(3)[np.argmin(np.abs(x[parallel]), axis=1)]
+    y = y - np.einsum("ij,ij->i", y, x)[:, np.newaxis]*x
+    y = y/np.linalg.norm(y, axis=1)[:, np.newaxis]
+    frame = np.stack([x, y, np.cross(x, y)], axis=1)
+    half = 0.5*np.asarray(size, dtype=float).reshape(-1, 3)
+    # Half the extent along each world axis, for the bounding box.
+    reach = np.einsum("mij,mi->mj", np.abs(frame), half)
+    return {
+        "kind": np.zeros(len(center), dtype=int),
+        "center": center,
+        "frame": frame,
+        "half": half,
+        "lo": center - reach,
+        "hi": center + reach,
+    }
+
+
+def tubes(base, direction, length, radius):
+    # A cylinder is the center of its base, a unit vector along its axis, a
+    # length, and a radius.
+    base = np.asarray(base, dtype=float).reshape(-1, 3)
+    direction = np.asarray(direction, dtype=float).reshape(-1, 3)
+    length = np.asarray(length, dtype=float)
+    radius = np.asarray(radius, dtype=float)
+    tip = base + length[:, np.newaxis]*direction
+    # The round ends stick out less along the axis they point down.
+    reach = radius[:, np.newaxis]*np.sqrt(np.maximum(0, 1 - direction**2))
+    # Stored in the same slots as the boxes, so everything fits in one set
+    # of arrays. The frame's first row is the axis, the first half-size is
+    # the length, and the second is the radius.
+    frame = np.zeros((len(base), 3, 3))
+    frame[:, 0] = direction
+    half = np.zeros((len(base), 3))
+    half[:, 0] = length
+    half[:, 1] = radius
+    return {
+        "kind": np.ones(len(base), dtype=int),
+        "center": base,
+        "frame": frame,
+        "half": half,
+        "lo": np.minimum(base, tip) - reach,
+        "hi": np.maximum(base, tip) + reach,
+    }
+
+
+def merge(*scenes):
+    return {
+        name: np.concatenate([scene[name] for scene in scenes])
+        for name in scenes[0]
+    }
+
+
+def build_bvh(scene):
+    """Tree over the obstacles in scene. Each node splits its obstacles in
+    half along the direction they're most spread out in, until there are
+    LEAF_SIZE or fewer. Children are stored next to each other.
+    """
+    nobstacles = len(scene["lo"])
+    centers = 0.5*(scene["lo"] + scene["hi"])
+    order = np.arange(nobstacles)
+    start, count, first_child = [0], [nobstacles], [-1]
+    node = 0
+    # Nodes get split in the order they were made, so the arrays grow as
+    # the loop goes.
+    while node < len(start):
+        lo, n = start[node], count[node]
+        if n > LEAF_SIZE:
+            members = order[lo:lo + n]
+            spread = np.ptp(centers[members], axis=0)
+            axis = np.argmax(spread)
+            half = n//2
+            split = np.argpartition(centers[members, axis], half)
+            order[lo:lo + n] = members[split]
+            first_child[node] = len(start)
+            start += [lo, lo + half]
+            count += [half, n - half]
+            first_child += [-1, -1]
+        node += 1
+    start = np.array(start)
+    count = np.array(count)
+    first_child = np.array(first_child)
+    # Bounding boxes, from the leaves up. Children always come after their
+    # parents, so going backward handles every child before its parent.
+    node_lo = np.empty((len(start), 3))
+    node_hi = np.empty((len(start), 3))
+    for node in range(len(start) - 1, -1, -1):
+        child = first_child[node]
+        if child < 0:
+            members = order[start[node]:start[node] + count[node]]
+            node_lo[node] = scene["lo"][members].min(axis=0)
+            node_hi[node] = scene["hi"][members].max(axis=0)
+        else:
+            node_lo[node] = np.minimum(node_lo[child], node_lo[child + 1])
+            node_hi[node] = np.maximum(node_hi[child], node_hi[child + 1])
+    return {
+        "scene": scene,
+        "order": order,
+        "start": start,
+        "count": count,
+        "first_child": first_child,
+        "lo": node_lo,
+        "hi": node_hi,
+    }
+
+
+def query(tree, pos, radius):
+    # Every (ball, obstacle) pair that's actually touching, as two index
+    # arrays.
+    ball, obstacle = candidates(tree, pos, radius)
+    depth, _ = contacts(tree["scene"], pos[ball], radius, obstacle)
+    touching = depth > 0
+    return ball[touching], obstacle[touching]
+
+
+def candidates(tree, pos, radius):
+    """Every (ball, obstacle) pair where the ball's bounding box overlaps the
+    obstacle's. Returns two index arrays. Each ball starts at the root and
+    only moves down into nodes it overlaps.
+    """
+    ball = np.arange(len(pos))
+    node = np.zeros(len(pos), dtype=int)
+    found_ball, found_obstacle = [], []
+    while len(node):
+        overlap = np.all(
+            (pos[ball] + radius >= tree["lo"][node]) &
+            (pos[ball] - radius <= tree["hi"][node]),
+            axis=1,
+        )
+        ball, node = ball[overlap], node[overlap]
+        leaf = tree["first_child"][node] < 0
+        # Leaves hand over all their obstacles.
+        count = tree["count"][node[leaf]]
+        first = np.cumsum(count) - count
+        slot = (
+            np.repeat(tree["start"][node[leaf]], count) +
+            np.arange(count.sum()) - np.repeat(first, count)
+        )
+        found_ball.append(np.repeat(ball[leaf], count))
+        found_obstacle.append(tree["order"][slot])
+        # Everything else moves down to both children.
+        ball = np.repeat(ball[~leaf], 2)
+        node = np.repeat(tree["first_child"][node[~leaf]], 2)
+        node[1::2] += 1
+    return np.concatenate(found_ball), np.concatenate(found_obstacle)
+
+
+def contacts(scene, pos, radius, obstacle):
+    """How far each ball sinks into its obstacle, and the unit vector that
+    points out of the obstacle at the contact. Depth is negative for a ball
+    that isn't touching.
+    """
+    kind = scene["kind"][obstacle]
+    depth = np.empty(len(pos))
+    normal = np.empty((len(pos), 3))
+    for k, closest in ((0, box_surface), (1, cylinder_surface)):
+        these = kind == k
+        if np.any(these):
+            distance, normal[these] = closest(
+                scene, pos[these], obstacle[these]
+            )
+            depth[these] = radius - distance
+    return depth, normal
+
+
+def box_surface(scene, pos, obstacle):
+    # Signed distance from each point to the surface of its box, negative
+    # inside, along with the outward direction.
+    frame, half = scene["frame"][obstacle], scene["half"][obstacle]
+    local = np.einsum("mij,mj->mi", frame, pos - scene["center"][obstacle])
+    outside = local - np.clip(local, -half, half)
+    distance = np.linalg.norm(outside, axis=1)
+    with np.errstate(invalid="ignore"):
+        direction = outside/distance[:, np.newaxis]
+    # A point inside gets pushed out through the nearest face.
+    inside = distance == 0
+    if np.any(inside):
+        room = half[inside] - np.abs(local[inside])
+        face = np.argmin(room, axis=1)
+        rows = np.arange(len(face))
+        direction[inside] = 0
+        sign = np.where(local[inside][rows, face] < 0, -1, 1)
+        direction[inside, face] = sign
+        distance[inside] = -room[rows, face]
+    return distance, np.einsum("mij,mi->mj", frame, direction)
+
+
+def cylinder_surface(scene, pos, obstacle):
+    # Same as box_surface(), for cylinders.
+    base = scene["center"][obstacle]
+    axis = scene["frame"][obstacle, 0]
+    length = scene["half"][obstacle, 0]
+    radius = scene["half"][obstacle, 1]
+    rel = pos - base
+    along = np.einsum("ij,ij->i", rel, axis)
+    radial = rel - along[:, np.newaxis]*axis
+    rho = np.linalg.norm(radial, axis=1)
+    # A point right on the axis can be pushed out in any sideways direction.
+    on_axis = rho == 0
+    if np.any(on_axis):
+        sideways = np.cross(axis[on_axis], [1, 0, 0])
+        flat = np.linalg.norm(sideways, axis=1) < 1e-6
+        sideways[flat] = np.cross(axis[on_axis][flat], [0, 1, 0])
+        radial[on_axis] = sideways
+        rho_safe = np.where(on_axis, np.linalg.norm(radial, axis=1), rho)
+    else:
+        rho_safe = rho
+    out = radial/rho_safe[:, np.newaxis]
+    nearest = (
+        base + np.clip(along, 0, length)[:, np.newaxis]*axis +
+        np.minimum(rho, radius)[:, np.newaxis]*out
+    )
+    offset = pos - nearest
+    distance = np.linalg.norm(offset, axis=1)
+    with np.errstate(invalid="ignore"):
+        direction = offset/distance[:, np.newaxis]
+    # A point inside gets pushed out through the side or an end, whichever
+    # is closest.
+    inside = distance == 0
+    if np.any(inside):
+        room = np.stack([
+            radius[inside] - rho[inside], along[inside],
+            length[inside] - along[inside],
+        ], axis=1)
+        way_out = np.argmin(room, axis=1)
+        choices = np.stack([
+            out[inside], -axis[inside], axis[inside]
+        ], axis=1)
+        rows = np.arange(len(way_out))
+        direction[inside] = choices[rows, way_out]
+        distance[inside] = -room[rows, way_out]
+    return distance, direction
+
+
+def bounce(tree, pos, vel, radius):
+    """Bounce balls off the obstacles in the tree, in place. A ball touching
+    more than one obstacle deals with the deepest one now, and the rest on
+    later steps. It gets moved back out to the surface, and if it's heading
+    in, the part of its velocity going in gets flipped.
+    """
+    ball, obstacle = candidates(tree, pos, radius)
+    depth, normal = contacts(tree["scene"], pos[ball], radius, obstacle)
+    # Bounding boxes can overlap without the obstacles touching.
+    touching = depth > 0
+    if not np.any(touching):
+        return
+    ball, depth, normal = ball[touching], depth[touching], normal[touching]
+    # Deepest contact for each ball: sort by depth, then keep each ball's
+    # last entry.
+    order = np.lexsort((depth, ball))
+    last = np.r_[ball[order][1:] != ball[order][:-1], True]
+    pick = order[last]
+    ball, depth, normal = ball[pick], depth[pick], normal[pick]
+    pos[ball] += depth[:, np.newaxis]*normal
+    inward = np.einsum("ij,ij->i", vel[ball], normal)
+    heading_in = inward < 0
+    vel[ball[heading_in]] -= (
+        2*inward[heading_in, np.newaxis]*normal[heading_in]
+    )
+    return
+
+
+if __name__ == "__main__":
+    main()
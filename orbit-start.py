@@ -24,6 +24,17 @@ EARTH_ORBITAL_ANGULAR_MOMENTUM = EARTH_ORBIT_RADIUS*EARTH_MOMENTUM
 # Scale back the trails and graphs to make execution smoother.
 PLOT_INTERVAL = 20
 
+# Time integrator. The default is the semi-implicit Euler method, stepped
+# right here in the loop. Try "leapfrog", "yoshida4", or "adaptive" from
+# integrators.py for much less energy drift. The adaptive one slows down to
+# get through tight perihelion passes cleanly.
+INTEGRATOR = "euler"
+
+# With the sun fixed, each planet is its own two-body problem, which has an
+# exact solution. Set this to look up each planet's state with kepler.py rather
+# than stepping it forward. The numerical loop is still there as a check.
+USE_KEPLER = False
+
 
 def main():
     init_graph()
@@ -40,20 +51,46 @@ def main():
     dt = 0.001*YEAR
     step = 0
     max_steps = 10*YEAR/dt
+    if USE_KEPLER:
+        # Work out every planet at every step in one go, before the loop
+        # starts. Each frame then just copies its row into the spheres.
+        # Imported here so the default runs without numpy.
+        import kepler
+        positions, velocities = kepler.propagate_grid(
+            [planet.pos_initial for planet in planets],
+            [planet.velocity_initial for planet in planets],
+            [n*dt for n in range(1, int(ceil(max_steps)) + 1)],
+            G*sun.mass,
+        )
+        positions, velocities = positions.tolist(), velocities.tolist()
     while step < max_steps:
         # Play back one year of movement per second.
         rate(1*YEAR/dt)
         step += 1
-        for planet in planets:
+        for i, planet in enumerate(planets):
             r = planet.pos - sun.pos
-            force = -r.hat * G*planet.mass*sun.mass/r.mag**2
             # We want each two-body problem to be independent, but they all
             # share the same sun. To avoid any coupling between the planets,
             # fix the position of the sun. This is only a tiny bit inaccurate
             # since the sun is several orders of magnitude more massive than
             # the earth.
-            planet.momentum += force*dt
-            planet.pos += planet.momentum*dt/planet.mass
+            if USE_KEPLER:
+                planet.pos = vector(*positions[step - 1][i])
+                velocity = vector(*velocities[step - 1][i])
+                planet.momentum = velocity*planet.mass
+            elif INTEGRATOR == "euler":
+                force = -r.hat * G*planet.mass*sun.mass/r.mag**2
+                planet.momentum += force*dt
+                planet.pos += planet.momentum*dt/planet.mass
+            else:
+                pos, velocity = planet.step(
+                    planet.pos,
+                    planet.momentum/planet.mass,
+                    lambda pos: gravity(pos, sun),
+                    dt,
+                )
+                planet.pos = pos
+                planet.momentum = velocity*planet.mass
             energy = system_energy(sun, planet)
             # To improve performance, don't update the graph every time
             if step % PLOT_INTERVAL == 0:
@@ -61,6 +98,12 @@ def main():
     return
 
 
+def gravity(pos, sun):
+    # Acceleration of a planet at pos, pulled toward the fixed sun.
+    r = pos - sun.pos
+    return -r.hat * G*sun.mass/r.mag**2
+
+
 def system_energy(body1, body2):
     return (
         0.5*body1.momentum.mag**2/body1.mass +
@@ -121,6 +164,17 @@ def get_planet(color, launch_angle):
     # We need a curve for each planet object. Might as well attach the
     # curves to the planets rather than storing them somewhere else.
     planet.curve = gcurve(color=color, width=2)
+    # Same deal for the integrator. The adaptive one keeps track of its step
+    # size, so each planet gets its own. Imported here so the default runs
+    # without numpy.
+    if INTEGRATOR != "euler":
+        import integrators
+        planet.step = integrators.get_integrator(INTEGRATOR)
+    # The exact solution only needs to know where the planet started, relative
+    # to the sun at the origin.
+    velocity = planet.momentum/planet.mass
+    planet.pos_initial = (planet.pos.x, planet.pos.y, planet.pos.z)
+    planet.velocity_initial = (velocity.x, velocity.y, velocity.z)
     return planet
 
 
@@ -14,10 +14,31 @@ G = 6.674e-11
 
 V_EARTH = 2*math.pi*AU/YEAR
 
+# Keep the physics in NumPy arrays with nbody.py, and only touch the spheres
+# when a frame gets drawn. The settings below all work on the arrays, so
+# changing any of them turns this on too.
+USE_ARRAYS = False
+
+# Physics steps to take between drawn frames. With 1, every day gets drawn,
+# just like before. Larger values skip drawing and run much faster.
+STEPS_PER_FRAME = 1
+
+# Any name from integrators.py: euler, leapfrog, yoshida4, or adaptive. Euler
+# is what this script has always used. The others hold energy much steadier.
+INTEGRATOR = "euler"
+
+# Computing and plotting energy every frame takes more time than the physics.
+# In record mode, the loop only saves the state. Energy gets computed for the
+# whole run at the end, and the graphs get a thinned-out copy.
+RECORD = False
+
 
 def main():
     sun, earth = init_bodies()
     graphs = init_graphs()
+    if USE_ARRAYS or STEPS_PER_FRAME > 1 or INTEGRATOR != "euler" or RECORD:
+        run_arrays(sun, earth, graphs)
+        return
     t, dt, tmax = 0, 1*DAY, 5*YEAR
     while t < tmax:
         t += dt
@@ -47,6 +68,71 @@ def main():
     return
 
 
+def run_arrays(sun, earth, graphs):
+    # Imported here so the default runs without numpy.
+    import nbody
+    # The physics lives in arrays, not in the spheres. Body order here sets
+    # the row order in the arrays.
+    bodies = [sun, earth]
+    pos, vel, mass = nbody.get_state(bodies)
+    # nbody.py steps with semi-implicit Euler unless it's handed something
+    # else.
+    step = None
+    if INTEGRATOR != "euler":
+        import integrators
+        step = integrators.get_integrator(INTEGRATOR)
+    if RECORD:
+        import diagnostics
+        recording = diagnostics.new_recording("t", "pos", "vel")
+    t, dt, tmax = 0, 1*DAY, 5*YEAR
+    while t < tmax:
+        # Several physics steps per drawn frame. Only the frame touches the
+        # scene and the graphs.
+        nbody.advance(
+            pos, vel, mass, dt, nsteps=STEPS_PER_FRAME, g=G, step=step
+        )
+        t += dt*STEPS_PER_FRAME
+        # Scale down the rate so 1 year takes 10 seconds
+        rate_scale = YEAR/(10*SECOND)
+        vpython.rate(rate_scale/(dt*STEPS_PER_FRAME))
+        sync_bodies(bodies, pos, vel)
+        earth.path.append(earth.pos)
+        if RECORD:
+            diagnostics.record(recording, t=t, pos=pos.copy(), vel=vel.copy())
+            continue
+        # Plot the energy, I guess
+        energy_pot, energy_kin = nbody.energy(pos, vel, mass, g=G)
+        graphs["potential"].plot(t/DAY, energy_pot)
+        graphs["kinetic"].plot(t/DAY, energy_kin)
+        graphs["total"].plot(t/DAY, energy_pot + energy_kin)
+    if RECORD:
+        plot_recording(graphs, recording, mass)
+    return
+
+
+def plot_recording(graphs, recording, mass):
+    # Energy for every recorded frame in one pass, then plot what we can see.
+    import diagnostics
+    import nbody
+    history = diagnostics.to_arrays(recording)
+    energy_pot, energy_kin = nbody.energy(
+        history["pos"], history["vel"], mass, g=G
+    )
+    days = history["t"]/DAY
+    diagnostics.plot(graphs["potential"], days, energy_pot)
+    diagnostics.plot(graphs["kinetic"], days, energy_kin)
+    diagnostics.plot(graphs["total"], days, energy_pot + energy_kin)
+    return
+
+
+def sync_bodies(bodies, pos, vel):
+    # Copy the array state back onto the spheres so the scene can draw it.
+    for body, p, v in zip(bodies, pos, vel):
+        body.pos = vpython.vector(*p)
+        body.v = vpython.vector(*v)
+    return
+
+
 def init_graphs():
     vpython.graph(
         title="Energy of Earth's Orbit",
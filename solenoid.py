@@ -12,17 +12,35 @@ z = -length/2
 loops = 20
 dz_dtheta = length/(loops*360*deg)
 
+# One cylinder for every 5 degrees of every loop is over a thousand objects
+# for vpython to keep track of. As a single mesh, the coil is one.
+SINGLE_MESH = False
+
+# Save the points for the single mesh to meshes.CACHE_DIR the first time, and
+# load them from there, memory mapped, every time after that.
+CACHE_GEOMETRY = False
+
 theta = 0
 
-while z < length/2:
-
-    head = vector(z, r*sin(theta), r*cos(theta))
-    theta += dtheta
-    z += dz_dtheta*dtheta
-    tail = vector(z, r*sin(theta), r*cos(theta))
-    cylinder(
-        pos=tail,
-        axis=(head - tail),
-        radius=0.05,
-        texture=textures.metal,
-    )
+if SINGLE_MESH:
+    # Imported here so the default runs without numpy.
+    import meshes
+    params = {"radius": r, "length": length, "loops": loops, "step": dtheta}
+    if CACHE_GEOMETRY:
+        points = meshes.cached(meshes.helix, params)
+    else:
+        points = meshes.helix(**params)
+    meshes.tube(points, 0.05, texture=textures.metal)
+else:
+    while z < length/2:
+
+        head = vector(z, r*sin(theta), r*cos(theta))
+        theta += dtheta
+        z += dz_dtheta*dtheta
+        tail = vector(z, r*sin(theta), r*cos(theta))
+        cylinder(
+            pos=tail,
+            axis=(head - tail),
+            radius=0.05,
+            texture=textures.metal,
+        )
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+"""
+Spectral engine for fourier-waves.py. The standing wave shapes never change,
+so the matrix of sin(n pi x/L) values gets built once and cached. Each frame
+is then just a matrix-vector product with that frame's time coefficients.
+
+The weights of the standing waves come from a discrete sine transform, done
+with an FFT. That's O(N log N) rather than one O(N) sum per mode.
+
+Running this file directly times a frame at a few sizes, then times the
+weights for a million samples.
+"""
+
+import functools
+import time
+
+import numpy as np
+
+
+def main():
+    print("%8s %8s %12s" % ("points", "terms", "ms/frame"))
+    for npoints, nterms in ((100, 20), (1000, 1000), (10000, 10000)):
+        cutoffs = (3, 10, nterms)
+        modes = mode_matrix(npoints, nterms, 10)
+        alpha = np.ones(nterms)/np.arange(1, nterms + 1)
+        beta = np.zeros(nterms)
+        omega = frequencies(nterms, 10, 1)
+        nframes = 20
+        start = time.perf_counter()
+        for i in range(nframes):
+            partial_sums(modes, alpha, beta, omega, 0.1*i, cutoffs)
+        elapsed = time.perf_counter() - start
+        print("%8d %8d %12.2f" % (npoints, nterms, 1000*elapsed/nframes))
+    npoints = 10**6
+    x = np.linspace(0, 10, npoints)
+    samples = np.where(x < 2, np.sin(np.pi*x/2)**2, 0)
+    start = time.perf_counter()
+    sine_weights(samples, npoints)
+    elapsed = time.perf_counter() - start
+    print("%d weights from %d samples: %.2f s" % (npoints, npoints, elapsed))
+    return
+
+
+@functools.lru_cache(maxsize=4)
+def mode_matrix(npoints, nterms, length):
+    # Row n is standing wave n+1, sampled at npoints spaced evenly from 0 to
+    # length. It's shared between callers, so lock it against changes.
+    x = np.linspace(0, length, npoints)
+    n = np.arange(1, nterms + 1)
+    modes = np.sin(np.pi*n[:, np.newaxis]*x[np.newaxis, :]/length)
+    modes.flags.writeable = False
+    return modes
+
+
+def frequencies(nterms, length, speed):
+    # Angular frequency of each standing wave.
+    return np.arange(1, nterms + 1)*np.pi*speed/length
+
+
+def sine_weights(samples, nterms):
+    """Projection of samples onto each of the first nterms standing waves.
+    Gives the same numbers as inner_product(samples, eigenvector(n)) in
+    fourier-waves.py, with samples spaced evenly from 0 to L inclusive.
+    """
+    samples = np.asarray(samples, dtype=float)
+    npoints = len(samples)
+    # The sum over sin((n+1) pi i/(N-1)) is a type I sine transform of the
+    # interior samples, since sin is zero at both ends. Take it with an FFT of
+    # the odd extension of the samples.
+    interior = samples[1:-1]
+    size = len(interior)
+    extended = np.zeros(2*(size + 1))
+    extended[1:size + 1] = interior
+    extended[size + 2:] = -interior[::-1]
+    transform = -np.fft.rfft(extended).imag
+    # Past N-2 terms the grid can't tell the waves apart. They alias back onto
+    # lower ones, or onto zero, so fold them back to match the direct sum.
+    k = np.arange(1, nterms + 1) % (2*(size + 1))
+    folded = np.where(k <= size + 1, k, 2*(size + 1) - k)
+    sign = np.where(k <= size + 1, 1, -1)
+    # The direct sum has a weight of dx = L/N and a normalization of 2/L.
+    return sign*transform[folded]/npoints
+
+
+def partial_sums(modes, alpha, beta, omega, t, cutoffs):
+    """Displacement at time t using the first k terms, for each k in cutoffs.
+    Each block of modes between one cutoff and the next is multiplied in once,
+    and the blocks are added up as we go, so the whole thing is one pass
+    through the mode matrix no matter how many cutoffs there are.
+    """
+    weights = alpha*np.cos(omega*t) + beta*np.sin(omega*t)
+    bounds = (0,) + tuple(cutoffs)
+    blocks = [
+        weights[lo:hi] @ modes[lo:hi]
+        for lo, hi in zip(bounds[:-1], bounds[1:])
+    ]
+    return np.cumsum(blocks, axis=0)
+
+
+if __name__ == "__main__":
+    main()
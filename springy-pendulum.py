@@ -9,6 +9,13 @@ Fall 2020
 
 GRAVITY = 9.8
 
+# Working out and plotting four energies every step takes longer than the
+# physics. In record mode, the loop only saves the ball's state. Energy gets
+# computed once the run is over, and only every PLOT_EVERY-th point goes to
+# the graphs.
+RECORD = False
+PLOT_EVERY = 10
+
 
 def main():
     graphs = init_graphs()
@@ -18,6 +25,8 @@ def main():
     # Note that the springy pendulum requires a pretty small time step for
     # stability! With a larger time step, energy is not conserved.
     t, dt, tmax = 0, 0.01, 30
+    # GlowScript can't import numpy, so the recording is plain lists.
+    recording = {"t": [], "pos": [], "velocity": []}
     while t < tmax:
         t += dt
         rate(1/dt)
@@ -34,6 +43,11 @@ def main():
         ball.pos += ball.velocity*dt
         # Update the spring to stay connected to the ball
         spring.axis = ball.pos - spring.pos
+        if RECORD:
+            recording["t"].append(t)
+            recording["pos"].append(vector(ball.pos))
+            recording["velocity"].append(vector(ball.velocity))
+            continue
         # Update the graphs every iteration
         energy_spring = 0.5*spring.spring_constant*stretch**2
         energy_grav = ball.mass*GRAVITY*ball.pos.y
@@ -43,6 +57,25 @@ def main():
         graphs["spring"].plot(t, energy_spring)
         graphs["grav"].plot(t, energy_grav)
         graphs["total"].plot(t, energy_total)
+    if RECORD:
+        plot_recording(graphs, recording, spring, ball)
+    return
+
+
+def plot_recording(graphs, recording, spring, ball):
+    # Same energies as the main loop, but only for the points we'll plot.
+    for i in range(0, len(recording["t"]), PLOT_EVERY):
+        t = recording["t"][i]
+        pos = recording["pos"][i]
+        stretch = (pos - spring.pos).mag - spring.length_relax
+        energy_spring = 0.5*spring.spring_constant*stretch**2
+        energy_grav = ball.mass*GRAVITY*pos.y
+        energy_kinetic = 0.5*ball.mass*recording["velocity"][i].mag**2
+        energy_total = energy_spring + energy_kinetic + energy_grav
+        graphs["kinetic"].plot(t, energy_kinetic)
+        graphs["spring"].plot(t, energy_spring)
+        graphs["grav"].plot(t, energy_grav)
+        graphs["total"].plot(t, energy_total)
     return
 
 
@@ -3,6 +3,7 @@
 from math import *
 from vpython import *
 
+import time
 
 SPRING_CONSTANTS = [1, 1, 1]
 BLOCK_MASSES = [1, 1]
@@ -12,8 +13,27 @@ N_BLOCKS = len(BLOCK_MASSES)
 # Relaxed length is a cosmetic detail so we might as well keep it consistent.
 RELAXED_LENGTH = 10
 
+# The system is linear, so it can be solved exactly. Set this to work out the
+# whole motion up front from the normal modes rather than stepping it.
+USE_NORMAL_MODES = False
+
+# Lattice mode skips the drawing and runs a long line of identical blocks and
+# springs with the array code in lattice.py, starting from a bump in the
+# middle. Every LATTICE_SNAPSHOT_EVERY steps, all the displacements get saved
+# as a row of LATTICE_FILE. With LATTICE_PERIODIC, the line wraps around
+# rather than ending at walls.
+LATTICE = False
+LATTICE_BLOCKS = 10**5
+LATTICE_PERIODIC = False
+LATTICE_STEPS = 10**4
+LATTICE_SNAPSHOT_EVERY = 100
+LATTICE_FILE = "three-springs-lattice.npy"
+
 
 def main():
+    if LATTICE:
+        run_lattice()
+        return
     init_graph()
     # Even though there are only a few masses, it's still convenient to keep
     # track of the movement of the masses in a list, just like we did for the
@@ -26,6 +46,9 @@ def main():
     t = 0
     tmax = 100
     dt = 0.01
+    if USE_NORMAL_MODES:
+        play_normal_modes(blocks, springs, dt, tmax)
+        return
     while t < tmax:
         rate(1/dt)
         t += dt
@@ -58,11 +81,68 @@ def get_forces(blocks, springs):
         for j in [-1, 1]:
             neighbor_distance = blocks[i+j].pos - blocks[i].pos
             stretch = neighbor_distance.mag - RELAXED_LENGTH
-            # The index of -1 refers to the last entry in the list.
-            forces[-1] += springs[i-1].k*stretch*neighbor_distance.hat
+            # The index of -1 refers to the last entry in the list. Block i
+            # sits between spring i-1 and spring i.
+            spring = springs[i-1] if j == -1 else springs[i]
+            forces[-1] += spring.k*stretch*neighbor_distance.hat
     return forces
 
 
+def play_normal_modes(blocks, springs, dt, tmax):
+    # Same times as the loop in main(). Every displacement is known before the
+    # animation starts, so the graph gets drawn in one go, and each frame just
+    # looks up where the blocks are. Imported here so the default runs without
+    # numpy.
+    import numpy as np
+    import curves
+    import normal_modes
+    times = np.arange(1, int(round(tmax/dt)) + 1)*dt
+    moving = blocks[1:-1]
+    state = normal_modes.solver(
+        BLOCK_MASSES, SPRING_CONSTANTS, BLOCK_POSITIONS,
+        [block.p.x/block.m for block in moving],
+    )
+    displacement, _ = state(times)
+    # Displacements are measured from where each block sits when the springs
+    # are relaxed.
+    relaxed = [block.pos.x - x for block, x in zip(moving, BLOCK_POSITIONS)]
+    positions = relaxed + displacement
+    for i, block in enumerate(moving):
+        curves.set_data(block.curve, times, positions[:, i])
+    for row in positions:
+        rate(1/dt)
+        for block, x in zip(moving, row):
+            block.pos = vector(x, block.pos.y, block.pos.z)
+        redraw_springs(blocks, springs)
+    return
+
+
+def run_lattice():
+    # Same spring and mass as the first ones above, and the same time step
+    # as main(). The bump is a few dozen blocks wide, so the waves it sends
+    # out are smooth.
+    import numpy as np
+    import lattice
+    x = BLOCK_POSITIONS[0]*lattice.pulse(
+        LATTICE_BLOCKS, center=LATTICE_BLOCKS//2, width=30
+    )
+    v = np.zeros(LATTICE_BLOCKS)
+    dt = 0.01
+    start = time.perf_counter()
+    lattice.record(
+        LATTICE_FILE, x, v, BLOCK_MASSES[0], SPRING_CONSTANTS[0], dt,
+        LATTICE_STEPS, LATTICE_SNAPSHOT_EVERY, LATTICE_PERIODIC,
+    )
+    elapsed = time.perf_counter() - start
+    print("%d blocks, %d steps: %.2f s" % (
+        LATTICE_BLOCKS, LATTICE_STEPS, elapsed
+    ))
+    print("snapshot every %g s saved to %s" % (
+        LATTICE_SNAPSHOT_EVERY*dt, LATTICE_FILE
+    ))
+    return
+
+
 def redraw_springs(blocks, springs):
     # Walls are blocks, so spring i lives between block i and block i+1.
     for i in range(N_BLOCKS+1):
@@ -72,8 +152,8 @@ def redraw_springs(blocks, springs):
 
 
 def init_blocks():
-    left_edge = vector(-1.5*RELAXED_LENGTH, 0, 0)
-    right_edge = vector(1.5*RELAXED_LENGTH, 0, 0)
+    left_edge = vector(-0.5*(N_BLOCKS + 1)*RELAXED_LENGTH, 0, 0)
+    right_edge = -left_edge
     # The first and last "blocks" are walls fixed on the left and right.
     walls = []
     for x in [left_edge, right_edge]:
@@ -85,7 +165,8 @@ def init_blocks():
             p=vec(0, 0, 0),
         )
         walls.append(wall)
-    # In between the walls are a pair of moving masses.
+    # In between the walls are the moving masses. If there are more than two,
+    # the colors go around again.
     colors = [color.blue, color.red]
     balls = []
     for i in range(N_BLOCKS):
@@ -93,14 +174,14 @@ def init_blocks():
         ball = sphere(
             pos=relaxed_pos + vector(BLOCK_POSITIONS[i], 0, 0),
             radius=0.2*RELAXED_LENGTH,
-            color=colors[i],
+            color=colors[i % len(colors)],
             m=BLOCK_MASSES[i],
             p=vector(0, 0, 0),
         )
-        ball.curve = gcurve(color=colors[i], width=2)
+        ball.curve = gcurve(color=colors[i % len(colors)], width=2)
         balls.append(ball)
     # Return them in the correct order!
-    return walls[0], balls[0], balls[1], walls[1]
+    return [walls[0]] + balls + [walls[1]]
 
 
 def init_springs(blocks):
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+
+"""
+How long a bead takes to slide down a wire of any shape, without stepping
+through time. Starting from rest, energy conservation gives the bead's speed
+at every height, so the time is just the integral of distance over speed
+along the wire. The wire comes in as samples of x and y, with splines
+through them.
+
+Right where the bead starts, its speed is zero and the integrand blows up.
+Swapping the variable for its square root takes care of that. What's left is
+smooth and gets integrated with adaptive Gauss-Kronrod quadrature. Each
+stretch of the integral is done with 15 points, and the 7 of those that make
+a Gauss rule on their own give a second answer to compare against. Where the
+two disagree, the stretch gets cut in half and tried again. Every stretch of
+every curve is worked on at once, as arrays.
+
+On top of that is a search for the fastest wire between two points. The wire
+is the heights at a handful of points, and the gradient of the time with
+respect to all of them comes from one batch of nudged curves.
+
+Running this file directly checks against the cycloid, times batches of
+curves, and compares the fastest wire found against the cycloid.
+"""
+
+import math
+import time
+
+import numpy as np
+import scipy.interpolate
+import scipy.optimize
+
+
+GRAVITY = 9.81
+
+# Relative error allowed in each travel time. Splines through a couple
+# hundred samples are only good to about 1e-7 anyway.
+TOLERANCE = 1e-8
+# The search for the fastest wire needs tighter than that. Which stretches
+# get cut in half jumps around from one curve to the next, and the jitter
+# in the time throws off its line searches.
+SEARCH_TOLERANCE = 1e-10
+# Stretches each integral starts out cut into, and how many times a stretch
+# can be cut in half before it's taken as is.
+START_PANELS = 4
+MAX_ROUNDS = 30
+
+# Gauss-Kronrod nodes on [-1, 1], the nonnegative half. The odd ones, counting
+# from zero, are also the 7-point Gauss nodes.
+KRONROD_NODES = (
+    0.991455371120812639206854697526329,
+    0.949107912342758524526189684047851,
+    0.864864423359769072789712788640926,
+    0.741531185599394439863864773280788,
+    0.586087235467691130294144845693013,
+    0.405845151377397166906606412076961,
+    0.207784955007898467600689403773245,
+    0.000000000000000000000000000000000,
+)
+KRONROD_WEIGHTS = (
+    0.022935322010529224963732008058970,
+    0.063092092629978553290700663189204,
+    0.104790010322250183839876322541518,
+    0.140653259715525918745189590510238,
+    0.169004726639267902826583426598550,
+    0.190350578064785409913256402421014,
+    0.204432940075298892414161999234649,
+    0.209482141084727828012999174891714,
+)
+GAUSS_WEIGHTS = (
+    0.129484966168869693270611432679082,
+    0.279705391489276667901467771423780,
+    0.381830050505118944950369775488975,
+    0.417959183673469387755102040816327,
+)
+
+
+def main():
+    radius = 100
+    exact = math.pi*math.sqrt(radius/GRAVITY)
+    # Same cycloid as the brachistochrone scripts, from a handful of starting
+    # angles. Every one of them should take the same time.
+    theta = np.linspace(0, math.pi, 200)
+    x = radius*(theta - np.sin(theta)) - math.pi*radius
+    y = radius*np.cos(theta)
+    start = np.linspace(0, 0.9, 10)
+    times = travel_times(x, y, start)
+    print("cycloid, worst error: %.2e s" % np.max(np.abs(times - exact)))
+    print("%8s %10s %12s" % ("curves", "time (s)", "curves/s"))
+    rng = np.random.default_rng(0)
+    for ncurves in (100, 1000, 10000):
+        # Random wiggles on the cycloid, all starting at the top.
+        wiggle = rng.normal(0, 1, (ncurves, 1))*np.sin(theta)**2
+        begin = time.perf_counter()
+        travel_times(x, y + wiggle)
+        elapsed = time.perf_counter() - begin
+        print("%8d %10.3f %12.0f" % (ncurves, elapsed, ncurves/elapsed))
+    print("%8s %12s %12s %10s" % ("nodes", "travel (s)", "vs cycloid",
+                                  "time (s)"))
+    for nnodes in (5, 10, 20):
+        begin = time.perf_counter()
+        _, y_best, fastest_time = fastest(
+            (x[0], y[0]), (x[-1], y[-1]), nnodes
+        )
+        elapsed = time.perf_counter() - begin
+        print("%8d %12.6f %12.2e %10.3f" % (
+            nnodes, fastest_time, fastest_time/exact - 1, elapsed
+        ))
+    return
+
+
+def travel_times(x, y, start=0, gravity=GRAVITY, tol=TOLERANCE):
+    """Time for a bead to slide from rest down each curve to its last
+    sample. Curves are rows of x and y, or a single row shared by every
+    start. The start is where the bead gets let go, from 0 at the first
+    sample to 1 at the last, and can be one per curve.
+    """
+    x, y = np.broadcast_arrays(
+        np.atleast_2d(np.asarray(x, dtype=float)),
+        np.atleast_2d(np.asarray(y, dtype=float)),
+    )
+    start = np.asarray(start, dtype=float)
+    ncurves = max(len(x), start.size)
+    start = np.broadcast_to(start, (ncurves,))
+    curve = np.broadcast_to(np.arange(len(x)), (ncurves,))
+    # Splines in the sample number, scaled to run from 0 to 1.
+    knots = np.linspace(0, 1, x.shape[1])
+    x_spline = scipy.interpolate.CubicSpline(knots, x, axis=1)
+    y_spline = scipy.interpolate.CubicSpline(knots, y, axis=1)
+    # Spline wiggles right by the start can put the curve a hair above where
+    # the bead was let go. Anywhere the curve really does climb above that,
+    # the bead can't get past, and the time comes out enormous.
+    floor = 1e-12*np.ptp(y, axis=1)[curve]
+
+    # A bead at u = start + (1 - start)*w^2 for w from 0 to 1.
+    def integrand(job, w):
+        scale = 1 - start[job]
+        u = start[job] + scale*w**2
+        dx = evaluate(x_spline, curve[job], u, derivative=True)
+        dy = evaluate(y_spline, curve[job], u, derivative=True)
+        drop = np.maximum(-change(y_spline, curve[job], start[job], u),
+                          floor[job])
+        return 2*scale*w*np.hypot(dx, dy)/np.sqrt(2*gravity*drop)
+
+    return integrate(integrand, ncurves, tol)
+
+
+def resample(x, y, npoints):
+    # Points along the same splines travel_times() uses, for drawing.
+    knots = np.linspace(0, 1, len(x))
+    u = np.linspace(0, 1, npoints)
+    return (scipy.interpolate.CubicSpline(knots, x)(u),
+            scipy.interpolate.CubicSpline(knots, y)(u))
+
+
+def evaluate(spline, curve, u, derivative=False):
+    # Value or slope of each curve's spline at its own u. The spline holds
+    # every curve, and calling it would work out all of them at each u.
+    knots = spline.x
+    piece = np.clip(np.searchsorted(knots, u, side="right") - 1, 0,
+                    len(knots) - 2)
+    t = u - knots[piece]
+    c = spline.c[:, piece, curve]
+    if derivative:
+        return (3*c[0]*t + 2*c[1])*t + c[2]
+    return ((c[0]*t + c[1])*t + c[2])*t + c[3]
+
+
+def change(spline, curve, u0, u):
+    """How much each curve's spline goes up from u0 to u. Close to the
+    start, that's a tiny difference between two big heights, so within one
+    piece of the spline, it's worked out from the difference in t instead.
+    """
+    knots = spline.x
+    piece = np.clip(np.searchsorted(knots, u, side="right") - 1, 0,
+                    len(knots) - 2)
+    piece0 = np.clip(np.searchsorted(knots, u0, side="right") - 1, 0,
+                     len(knots) - 2)
+    t, t0 = u - knots[piece], u0 - knots[piece0]
+    c = spline.c[:, piece0, curve]
+    same = (piece == piece0)
+    within = (t - t0)*(c[0]*(t*t + t*t0 + t0*t0) + c[1]*(t + t0) + c[2])
+    apart = evaluate(spline, curve, u) - evaluate(spline, curve, u0)
+    return np.where(same, within, apart)
+
+
+def integrate(integrand, njobs, tol):
+    """Integrals from 0 to 1 of integrand(job, w) for jobs 0 through
+    njobs - 1. The integrand takes matching arrays of job numbers and points.
+    """
+    nodes = np.r_[-np.array(KRONROD_NODES[:-1]), KRONROD_NODES[::-1]]
+    kronrod = np.r_[KRONROD_WEIGHTS[:-1], KRONROD_WEIGHTS[::-1]]
+    gauss = np.zeros(15)
+    gauss[1::2] = np.r_[GAUSS_WEIGHTS[:-1], GAUSS_WEIGHTS[::-1]]
+    edges = np.linspace(0, 1, START_PANELS + 1)
+    job = np.repeat(np.arange(njobs), START_PANELS)
+    lo = np.tile(edges[:-1], njobs)
+    hi = np.tile(edges[1:], njobs)
+    total = np.zeros(njobs)
+    for rounds in range(MAX_ROUNDS):
+        half = 0.5*(hi - lo)
+        w = (lo + hi)[:, np.newaxis]*0.5 + half[:, np.newaxis]*nodes
+        f = integrand(np.repeat(job, 15).reshape(-1, 15), w)
+        best = half*(f @ kronrod)
+        error = np.abs(best - half*(f @ gauss))
+        # Rough size of each whole integral from the first try, to measure
+        # error against. Each stretch gets its share of the tolerance.
+        if rounds == 0:
+            size = np.bincount(job, np.abs(best), minlength=njobs)
+        done = (error <= tol*size[job]*2*half) | (rounds == MAX_ROUNDS - 1)
+        total += np.bincount(job[done], best[done], minlength=njobs)
+        job, lo, hi = job[~done], lo[~done], hi[~done]
+        if not len(job):
+            break
+        middle = 0.5*(lo + hi)
+        job = np.repeat(job, 2)
+        lo, hi = np.c_[lo, middle].ravel(), np.c_[middle, hi].ravel()
+    return total
+
+
+def fastest(top, bottom, nnodes, gravity=GRAVITY, tol=SEARCH_TOLERANCE):
+    """Search for the wire from top to bottom that a bead slides down the
+    quickest, from rest. The wire is a spline through heights at nnodes
+    points in between, packed in toward the top, where the best wire is
+    steepest. Returns the x and y of the wire and its travel time.
+    """
+    (x0, y0), (x1, y1) = top, bottom
+    x = x0 + (x1 - x0)*np.linspace(0, 1, nnodes + 2)**2
+    # Start from a straight line.
+    guess = y0 + (y1 - y0)*(x[1:-1] - x0)/(x1 - x0)
+    # Big enough nudges that the change in time stands well clear of the
+    # quadrature error.
+    nudge = math.sqrt(tol)*abs(y1 - y0)
+
+    def objective(heights):
+        # Time for these heights and for each one nudged up and down, all in
+        # one batch. The differences give the gradient.
+        batch = np.tile(np.r_[y0, heights, y1], (2*nnodes + 1, 1))
+        rows = np.arange(nnodes)
+        batch[1 + rows, 1 + rows] += nudge
+        batch[1 + nnodes + rows, 1 + rows] -= nudge
+        times = travel_times(x, batch, gravity=gravity, tol=tol)
+        gradient = (times[1:nnodes + 1] - times[nnodes + 1:])/(2*nudge)
+        return times[0], gradient
+
+    # Nothing above the top, where the bead could never get to.
+    bounds = [(None, y0 - nudge)]*nnodes
+    best = scipy.optimize.minimize(objective, guess, jac=True,
+                                   method="L-BFGS-B", bounds=bounds)
+    return x, np.r_[y0, best.x, y1], best.fun
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+"""
+Lookup tables for the shape of a wire, for beads sliding along it. The wire
+is traced once from a pair of functions giving x and y along some parameter,
+like the angle of the rolling wheel for a cycloid. Splines through those
+points then give position, direction, and arc length anywhere along the
+wire. Inverse splines go the other way, from height or from arc length back
+to the parameter. Every lookup takes a whole array of beads at once, and
+none of them calls a trig function.
+
+Where a wire goes vertical or flat, the parameter as a function of height
+changes like a square root, which a spline can't follow. So the points are
+packed closer together toward the ends.
+
+Running this file directly checks the tables for the cycloid in the
+brachistochrone scripts against the exact answers, and times them against
+working each bead out one at a time.
+"""
+
+import math
+import time
+
+import numpy as np
+import scipy.interpolate
+
+
+# Points traced along the wire.
+NPOINTS = 2000
+
+
+def main():
+    radius = 100
+    wire = cycloid(radius)
+    # A few beads right down by the bottom, where it's hardest.
+    theta = np.r_[np.linspace(0.01, math.pi, 10**5), math.pi - 1e-6]
+    y = radius*np.cos(theta)
+    found, tangent = at_height(wire, y)
+    exact = np.column_stack((1 - np.cos(theta), -np.sin(theta)))
+    exact /= np.linalg.norm(exact, axis=1)[:, np.newaxis]
+    print("worst angle error: %.2e" % np.max(np.abs(found - theta)))
+    print("worst direction error: %.2e" % np.max(np.abs(tangent - exact)))
+    arc = 4*radius*(1 - np.cos(theta/2))
+    print("worst angle error from arc length: %.2e" % np.max(np.abs(
+        at_length(wire, arc)[0] - theta
+    )))
+    print("%8s %14s %14s" % ("beads", "table (ms)", "one by one (ms)"))
+    for nbeads in (10, 1000, 10**5):
+        y = radius*np.cos(np.linspace(0.1, 3, nbeads))
+        start = time.perf_counter()
+        at_height(wire, y)
+        elapsed = time.perf_counter() - start
+        # The way brachistochrone-force.py does it, with an acos and four
+        # trips through the wire functions for each bead.
+        start = time.perf_counter()
+        for height in y:
+            theta = math.acos(height/radius)
+            dy = radius*(math.cos(theta + 1e-5) - math.cos(theta - 1e-5))
+            dx = radius*(
+                (theta + 1e-5 - math.sin(theta + 1e-5)) -
+                (theta - 1e-5 - math.sin(theta - 1e-5))
+            )
+            math.sqrt(dx*dx + dy*dy)
+        elapsed_loop = time.perf_counter() - start
+        print("%8d %14.3f %14.3f" % (
+            nbeads, 1000*elapsed, 1000*elapsed_loop
+        ))
+    return
+
+
+def cycloid(radius, stop=math.pi):
+    # The wire from the brachistochrone scripts, from the top of the wheel
+    # down to the bottom, or on up the other side for a stop past pi. It's
+    # centered on x = 0, to sit in front of the camera.
+    return table(
+        lambda theta: radius*(theta - np.sin(theta)) - math.pi*radius,
+        lambda theta: radius*np.cos(theta),
+        0, stop,
+    )
+
+
+def table(x_of, y_of, start, stop, npoints=NPOINTS):
+    """Trace a wire from parameter start to stop. x_of and y_of take an
+    array of parameter values. Returns a dict of splines. Looking beads up by
+    height only works if the wire only ever goes down (or only ever goes
+    up) along the way.
+    """
+    # Closer together at the ends, like the shadow of evenly spaced points
+    # around a circle.
+    around = np.linspace(0, math.pi, npoints)
+    param = start + (stop - start)*0.5*(1 - np.cos(around))
+    x = scipy.interpolate.CubicSpline(param, x_of(param))
+    y = scipy.interpolate.CubicSpline(param, y_of(param))
+    dx, dy = x.derivative(), y.derivative()
+    # Arc length is the running integral of the speed along the wire.
+    speed = scipy.interpolate.CubicSpline(
+        param, np.hypot(dx(param), dy(param))
+    )
+    length = speed.antiderivative()
+    wire = {
+        "x": x,
+        "y": y,
+        "dx": dx,
+        "dy": dy,
+        "length": length,
+        # Monotone splines for going backward, so they never overshoot.
+        "param_at_length": scipy.interpolate.PchipInterpolator(
+            length(param), param
+        ),
+        "param_at_height": None,
+        # The very ends can be cusps, like the top of the cycloid, where the
+        # wire has no direction. Directions there come from the next point
+        # in instead.
+        "inside": (param[1], param[-2]),
+    }
+    height = y(param)
+    if np.all(np.diff(height) < 0):
+        wire["param_at_height"] = scipy.interpolate.PchipInterpolator(
+            height[::-1], param[::-1]
+        )
+    elif np.all(np.diff(height) > 0):
+        wire["param_at_height"] = scipy.interpolate.PchipInterpolator(
+            height, param
+        )
+    return wire
+
+
+def at_height(wire, y):
+    """Parameter and unit direction along the wire at each height in y.
+    Heights past either end of the wire get the end, which takes care of a
+    bead that jitters a hair below the bottom.
+    """
+    if wire["param_at_height"] is None:
+        raise ValueError("Wire height doesn't go one way, can't look it up")
+    lookup = wire["param_at_height"]
+    param = lookup(np.clip(y, lookup.x[0], lookup.x[-1]))
+    return param, direction(wire, param)
+
+
+def at_length(wire, s):
+    # Same as at_height(), by distance along the wire from the start.
+    lookup = wire["param_at_length"]
+    param = lookup(np.clip(s, lookup.x[0], lookup.x[-1]))
+    return param, direction(wire, param)
+
+
+def direction(wire, param):
+    # Unit vector along the wire at each parameter value, as (N, 2) rows,
+    # pointing the way the parameter increases.
+    param = np.clip(param, *wire["inside"])
+    tangent = np.stack((wire["dx"](param), wire["dy"](param)), axis=-1)
+    return tangent/np.linalg.norm(tangent, axis=-1, keepdims=True)
+
+
+def position(wire, param):
+    # (N, 2) rows of x and y.
+    return np.stack((wire["x"](param), wire["y"](param)), axis=-1)
+
+
+if __name__ == "__main__":
+    main()